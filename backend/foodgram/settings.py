@@ -11,18 +11,41 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("true", "1", "yes")
+
+
+# text - обычные строки, json - по объекту JSON на строку.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Журнал запросов в JSON, пишется в отдельном потоке. По умолчанию
+# выключен: включается на сервере (ACCESS_LOG=true), а не в тестах
+# и командах.
+ACCESS_LOG = env_bool("ACCESS_LOG", False)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "json": {
+            "()": "utils.log.JsonFormatter",
+        },
+    },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
+            **({"formatter": "json"} if LOG_FORMAT == "json" else {}),
+        },
+        "access": {
+            "class": "utils.log.BackgroundStreamHandler",
+            "formatter": "json",
         },
     },
     "root": {
@@ -35,6 +58,11 @@ LOGGING = {
             "level": os.getenv("DJANGO_LOG_LEVEL", "INFO"),
             "propagate": False,
         },
+        "foodgram.access": {
+            "handlers": ["access"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
@@ -53,6 +81,11 @@ DEBUG = False
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1,localhost').split(',')
 
+# wsgi - синхронные воркеры gunicorn, asgi - воркеры uvicorn под gunicorn.
+SERVER_PROFILE = os.getenv("SERVER_PROFILE", "wsgi")
+# Списки тегов, ингредиентов и короткие ссылки - async-представлениями.
+ASYNC_VIEWS = env_bool("ASYNC_VIEWS", SERVER_PROFILE == "asgi")
+
 
 # Application definition
 
@@ -80,11 +113,24 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ),
+    "DEFAULT_THROTTLE_CLASSES": ("utils.throttling.SlidingWindowThrottle",),
+    # nginx дописывает адрес клиента в конец X-Forwarded-For: анонимных
+    # клиентов различаем по нему, а не по присланному заголовку.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 1)),
     "DEFAULT_PERMISSION_CLASSES": (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "utils.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "utils.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.AcceptHeaderVersioning",
     "DEFAULT_VERSION": '1.0',
     "ALLOWED_VERSIONS": ['1.0', '2.0'],
@@ -94,6 +140,8 @@ REST_FRAMEWORK = {
 DJOSER = {
     "USER_CREATE_PASSWORD_RETYPE": True,
     "SEND_ACTIVATION_EMAIL": False,
+    # Смена пароля удаляет токены пользователя, см. users.signals.
+    "LOGOUT_ON_PASSWORD_CHANGE": True,
     "SERIALIZERS": {
         "user_create": "users.serializers.UserSerializer",
         "user": "users.serializers.UserSerializer",
@@ -101,18 +149,84 @@ DJOSER = {
     },
 }
 
+API_PREFIX = "/api/"
+# api - сессии, пользователь Django и сообщения не обрабатываются для
+# /api/, full - полный стек для всех запросов.
+MIDDLEWARE_PROFILE = os.getenv("MIDDLEWARE_PROFILE", "api")
+if MIDDLEWARE_PROFILE == "api":
+    SESSION_MIDDLEWARE = "utils.middleware.NonAPISessionMiddleware"
+    AUTH_MIDDLEWARE = "utils.middleware.NonAPIAuthenticationMiddleware"
+    MESSAGE_MIDDLEWARE = "utils.middleware.NonAPIMessageMiddleware"
+else:
+    SESSION_MIDDLEWARE = (
+        "django.contrib.sessions.middleware.SessionMiddleware"
+    )
+    AUTH_MIDDLEWARE = (
+        "django.contrib.auth.middleware.AuthenticationMiddleware"
+    )
+    MESSAGE_MIDDLEWARE = (
+        "django.contrib.messages.middleware.MessageMiddleware"
+    )
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "utils.middleware.ReplicaRoutingMiddleware",
+    SESSION_MIDDLEWARE,
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    AUTH_MIDDLEWARE,
+    MESSAGE_MIDDLEWARE,
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
 ]
 
+# Бюджет SQL-запросов на запрос и поиск N+1: off, log или raise.
+# Бюджеты действий задает query_budgets у ViewSet.
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", 10))
+# Сколько одинаковых запросов считать признаком N+1.
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))
+if QUERY_BUDGET_MODE != "off":
+    MIDDLEWARE = ["utils.middleware.QueryBudgetMiddleware", *MIDDLEWARE]
+
+# Метрики Prometheus на /metrics. PROMETHEUS_MULTIPROC_DIR - общий
+# каталог воркеров gunicorn, без него каждый процесс отдает только свои
+# значения.
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if METRICS_ENABLED:
+    MIDDLEWARE = ["utils.middleware.MetricsMiddleware", *MIDDLEWARE]
+
+if ACCESS_LOG:
+    MIDDLEWARE = ["utils.middleware.AccessLogMiddleware", *MIDDLEWARE]
+
+# Профилирование запросов: доля случайных запросов и токен для
+# заголовка X-Profile. sample - семплер стеков, cprofile - cProfile.
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_MODE = os.getenv("PROFILER_MODE", "sample")
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", 0.005))
+PROFILER_DIR = os.getenv(
+    "PROFILER_DIR", os.path.join(tempfile.gettempdir(), "foodgram-profiles")
+)
+if PROFILER_SAMPLE_RATE or PROFILER_TOKEN:
+    MIDDLEWARE = ["utils.middleware.ProfilerMiddleware", *MIDDLEWARE]
+
+# Время каждого слоя в заголовке Server-Timing, только для отладки.
+# Метки расставляются по готовому списку, чтобы попали все слои.
+if env_bool("MIDDLEWARE_TIMING", False):
+    MIDDLEWARE = [
+        "utils.middleware.ServerTimingMiddleware",
+        *(
+            path
+            for middleware in MIDDLEWARE
+            for path in (
+                f"utils.timing.{middleware.rsplit('.', 1)[1]}",
+                middleware,
+            )
+        ),
+        "utils.timing.View",
+    ]
+
 ROOT_URLCONF = "foodgram.urls"
 
 TEMPLATES = [
@@ -137,6 +251,14 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Постоянные соединения переживают запрос только в синхронных воркерах,
+# под ASGI их заменяет внешний пул (pgbouncer).
+DB_CONN_MAX_AGE = os.getenv(
+    "DB_CONN_MAX_AGE", "0" if SERVER_PROFILE == "asgi" else "60"
+)
+# pgbouncer - база доступна через pgbouncer в режиме transaction.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -145,15 +267,102 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "django"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", 5432),
+        # none - соединение живет, пока не оборвется.
+        "CONN_MAX_AGE": (
+            None if DB_CONN_MAX_AGE.lower() == "none"
+            else int(DB_CONN_MAX_AGE)
+        ),
+        # Проверка перед повторным использованием, а не на каждый запрос.
+        "CONN_HEALTH_CHECKS": env_bool("DB_CONN_HEALTH_CHECKS", True),
+        # Серверные курсоры не переживают смену соединения в pgbouncer.
+        "DISABLE_SERVER_SIDE_CURSORS": DB_POOL_MODE == "pgbouncer",
+        "OPTIONS": {
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+        },
     },
 }
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.sqlite3',
-#         'NAME': BASE_DIR / "db.sqlite3",
-#     }
-# }
+# Без PostgreSQL (локально, в тестах): DB_ENGINE=sqlite, файл SQLITE_NAME.
+if os.getenv("DB_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("SQLITE_NAME", BASE_DIR / "db.sqlite3"),
+        },
+    }
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2 - серверы
+# PostgreSQL, DB_REPLICA_NAMES=replica1.sqlite3 - другие базы того же
+# сервера или файлы SQLite.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    [
+        {"HOST": host.strip()}
+        for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+        if host.strip()
+    ]
+    + [
+        {"NAME": name.strip()}
+        for name in os.getenv("DB_REPLICA_NAMES", "").split(",")
+        if name.strip()
+    ],
+    start=1,
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        **replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["utils.db.ReplicaRouter"]
+# Сколько секунд после записи клиент читает с основной базы.
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", 5))
+
+CACHE_BACKENDS = {
+    # Файловый кэш общий для всех воркеров gunicorn в контейнере,
+    # локальный - свой у каждого процесса.
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "local": "django.core.cache.backends.locmem.LocMemCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[os.getenv("CACHE_BACKEND", "file")],
+        "LOCATION": os.getenv("CACHE_LOCATION", "/tmp/foodgram_cache"),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
+        "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "foodgram"),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+        },
+    },
+}
+
+REFERENCE_CACHE_TIMEOUT = int(os.getenv("REFERENCE_CACHE_TIMEOUT", 86400))
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 600))
+# Токены: общий кэш и LRU каждого процесса перед ним.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+AUTH_TOKEN_LOCAL_TIMEOUT = float(os.getenv("AUTH_TOKEN_LOCAL_TIMEOUT", 5))
+AUTH_TOKEN_LOCAL_SIZE = int(os.getenv("AUTH_TOKEN_LOCAL_SIZE", 1000))
+
+# Лимиты дорогих действий, области задает throttle_scopes представлений.
+# Частота - на клиента (пользователь или IP) в общем кэше, число
+# одновременных запросов - на процесс.
+THROTTLE_ENABLED = env_bool("THROTTLE_ENABLED", True)
+THROTTLE_RATES = {
+    "recipe_write": os.getenv("THROTTLE_RECIPE_WRITE", "60/hour"),
+    "image_upload": os.getenv("THROTTLE_IMAGE_UPLOAD", "30/hour"),
+    "registration": os.getenv("THROTTLE_REGISTRATION", "10/hour"),
+    "shopping_cart_pdf": os.getenv("THROTTLE_SHOPPING_CART_PDF", "10/min"),
+}
+CONCURRENCY_LIMITS = {
+    "recipe_write": int(os.getenv("CONCURRENCY_RECIPE_WRITE", 2)),
+    "image_upload": int(os.getenv("CONCURRENCY_IMAGE_UPLOAD", 2)),
+    "registration": int(os.getenv("CONCURRENCY_REGISTRATION", 2)),
+    "shopping_cart_pdf": int(os.getenv("CONCURRENCY_SHOPPING_CART_PDF", 2)),
+}
 
 
 # Password validation
@@ -179,6 +388,18 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 CSV_DIR = os.path.join(BASE_DIR, "data")
 
+IMAGE_PROCESSING = {
+    "FORMAT": os.getenv("IMAGE_FORMAT", "WEBP"),
+    "QUALITY": int(os.getenv("IMAGE_QUALITY", 80)),
+    "MAX_SIZE": int(os.getenv("IMAGE_MAX_SIZE", 1280)),
+    "MAX_INPUT_SIZE": int(os.getenv("IMAGE_MAX_INPUT_SIZE", 10000)),
+    "MIN_SIZE": int(os.getenv("IMAGE_MIN_SIZE", 16)),
+    "THUMBNAIL_SIZES": {
+        "small": 160,
+        "medium": 480,
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -203,6 +424,15 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
 
+STORAGES = {
+    "default": {
+        "BACKEND": "recipes.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
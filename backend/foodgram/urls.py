@@ -3,9 +3,28 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from recipes.views import ingredient_list, short_link_redirect
+from tags.views import tag_list
+from utils.views import metrics_view, serve_media
+
+# Async-версии горячих списков перекрывают маршруты DRF.
+async_urlpatterns = [
+    path("api/tags/", tag_list, name="tag-list-async"),
+    path("api/ingredients/", ingredient_list, name="ingredient-list-async"),
+]
+
 urlpatterns = [
+    *(async_urlpatterns if settings.ASYNC_VIEWS else ()),
     path("admin/", admin.site.urls),
     path("api/", include("users.urls")),
     path("api/", include("tags.urls")),
     path("api/", include("recipes.urls")),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path("s/<str:short_code>", short_link_redirect, name="short-link"),
+    *(
+        [path("metrics", metrics_view, name="metrics")]
+        if settings.METRICS_ENABLED
+        else ()
+    ),
+] + static(
+    settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT
+)
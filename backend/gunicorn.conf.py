@@ -0,0 +1,113 @@
+"""
+Настройки gunicorn. Профиль выбирается переменной SERVER_PROFILE:
+wsgi - воркеры с потоками, asgi - воркеры uvicorn.
+"""
+import glob
+import os
+import tempfile
+import time
+
+BOOT_STARTED = time.monotonic()
+
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("true", "1", "yes")
+
+
+def cpu_count():
+    # В контейнере доступно столько ядер, сколько разрешено процессу.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+server_profile = os.getenv("SERVER_PROFILE", "wsgi")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+if server_profile == "asgi":
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    # Конкурентность внутри воркера дает цикл событий.
+    workers = int(os.getenv("GUNICORN_WORKERS", cpu_count() + 1))
+    threads = 1
+else:
+    wsgi_app = "foodgram.wsgi:application"
+    worker_class = "gthread"
+    # Пока один поток ждет базу или диск, другие обслуживают запросы.
+    workers = int(os.getenv("GUNICORN_WORKERS", cpu_count() * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Приложение загружается в мастере до fork: воркеры стартуют быстрее
+# и делят память с мастером.
+preload_app = env_bool("GUNICORN_PRELOAD", True)
+# Периодический перезапуск воркеров ограничивает рост памяти,
+# разброс не дает им перезапуститься одновременно.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Воркеры пишут метрики в общий каталог, /metrics суммирует их.
+# prometheus_client читает переменную при импорте, то есть после
+# загрузки этого файла.
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+        prefix="foodgram-metrics-"
+    )
+metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+
+
+def on_starting(server):
+    # Значения прошлого запуска не относятся к новым процессам.
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Импортируем представления и загружаем шрифт до fork,
+        # чтобы это не делал каждый воркер на первом запросе.
+        from django.db import connections
+        from django.urls import get_resolver
+
+        from recipes.views import register_pdf_font
+
+        get_resolver().url_patterns
+        register_pdf_font()
+        # Соединения мастера нельзя делить между воркерами.
+        connections.close_all()
+    server.log.info(
+        "Мастер готов за %.2f с: профиль %s, воркеров %s, потоков %s, "
+        "preload %s",
+        time.monotonic() - BOOT_STARTED,
+        server_profile,
+        server.cfg.workers,
+        server.cfg.threads,
+        server.cfg.preload_app,
+    )
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        "Воркер %s готов за %.3f с",
+        worker.pid,
+        time.monotonic() - worker.forked_at,
+    )
+
+
+def worker_exit(server, worker):
+    server.log.info(
+        "Воркер %s завершен после %s запросов", worker.pid, worker.nr
+    )
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid, metrics_dir)
@@ -1,7 +1,15 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
     verbose_name = "Рецепты"
+
+    def ready(self):
+        from utils.checks import check_throttle_cache
+
+        from . import signals  # noqa: F401
+
+        checks.register(check_throttle_cache, checks.Tags.caches)
@@ -1,25 +1,98 @@
+import binascii
+import os
+from tempfile import SpooledTemporaryFile
 
-import base64
-import uuid
-from django.core.files.base import ContentFile
+import filetype
+from django.conf import settings
+from django.core.files import File
 
 from rest_framework import serializers
 
+from .images import process_image
+
+# Сколько символов base64 декодируется за раз.
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_MARKER = ";base64,"
+# Сколько байт заголовка нужно filetype, чтобы узнать формат.
+IMAGE_HEADER_SIZE = 262
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         # Если полученный объект строка, и эта строка
         # начинается с 'data:image'...
         if isinstance(data, str) and data.startswith("data:image"):
-            # ...начинаем декодировать изображение из base64.
-            # Сначала нужно разделить строку на части.
-            format_image, imgstr = data.split(";base64,")
-            # И извлечь расширение файла.
-            ext = format_image.split("/")[-1]
-            # Генерируем уникальное имя файла
-            file_name = f"{uuid.uuid4()}.{ext}"
-            # Затем декодировать сами данные и поместить результат в файл,
-            # которому дать уникальное название.
-            data = ContentFile(base64.b64decode(imgstr), name=file_name)
-
-        return super().to_internal_value(data)
+            # ...декодируем base64 по частям, не копируя всю строку.
+            file = self.decode(data)
+            try:
+                return process_image(file)
+            finally:
+                file.close()
+
+        # Файлы из multipart или бинарного тела приходят уже готовыми.
+        # Уменьшаем и перекодируем картинку, заодно избавляясь от EXIF.
+        return process_image(super().to_internal_value(data))
+
+    def decode(self, data):
+        start = data.find(BASE64_MARKER)
+        if start == -1:
+            self.fail("invalid_image")
+        start += len(BASE64_MARKER)
+
+        # Маленькие картинки остаются в памяти, большие уходят на диск.
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        kind = None
+        # Переносы строк сдвигают группы по 4 символа: пробельные символы
+        # убираем, а неполную группу переносим в следующий кусок.
+        rest = ""
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                text = rest + "".join(
+                    data[offset:offset + BASE64_CHUNK_SIZE].split()
+                )
+                size = len(text) - len(text) % 4
+                rest = text[size:]
+                file.write(binascii.a2b_base64(text[:size]))
+                if kind is None and file.tell() >= IMAGE_HEADER_SIZE:
+                    # Проверяем заголовок до декодирования остального.
+                    kind = self.match_header(file)
+            if rest:
+                # Длина без пробелов не кратна 4.
+                raise ValueError
+            if kind is None and file.tell():
+                kind = self.match_header(file)
+        except ValueError:
+            file.close()
+            self.fail("invalid_image")
+        except serializers.ValidationError:
+            file.close()
+            raise
+
+        if kind is None:
+            file.close()
+            self.fail("empty")
+        file.seek(0)
+        return File(file, name=f"image.{kind.extension}")
+
+    def match_header(self, file):
+        file.seek(0)
+        kind = filetype.image_match(file.read(IMAGE_HEADER_SIZE))
+        if kind is None:
+            self.fail("invalid_image")
+        file.seek(0, os.SEEK_END)
+        return kind
+
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get("request")
+        if request is None:
+            return value.thumbnails
+        return {
+            label: request.build_absolute_uri(url)
+            for label, url in value.thumbnails.items()
+        }
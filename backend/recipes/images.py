@@ -0,0 +1,212 @@
+import io
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import signals
+from django.db.models.fields.files import ImageField, ImageFieldFile
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from utils.metrics import IMAGE_PROCESSING
+
+from .storage import ContentAddressedStorage, acquire, hold, release
+
+FORMAT_EXTENSIONS = {
+    "WEBP": "webp",
+    "JPEG": "jpg",
+}
+
+
+def _options():
+    return settings.IMAGE_PROCESSING
+
+
+def _extension():
+    return FORMAT_EXTENSIONS[_options()["FORMAT"]]
+
+
+def _encode(image):
+    options = _options()
+    image_format = options["FORMAT"]
+    # JPEG не умеет прозрачность, WebP - палитру.
+    if image_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    buffer = io.BytesIO()
+    # exif не передаем, поэтому метаданные в файл не попадают.
+    image.save(
+        buffer, image_format, quality=options["QUALITY"], optimize=True
+    )
+    return buffer.getvalue()
+
+
+def process_image(file):
+    """
+    Проверяет размеры, уменьшает и перекодирует загруженную картинку.
+    """
+    with IMAGE_PROCESSING.time():
+        return _process_image(file)
+
+
+def _process_image(file):
+    options = _options()
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except (OSError, Image.DecompressionBombError):
+        raise serializers.ValidationError(
+            "Загрузите корректное изображение."
+        )
+    width, height = image.size
+    if max(width, height) > options["MAX_INPUT_SIZE"]:
+        raise serializers.ValidationError(
+            f"Размер изображения не может превышать "
+            f"{options['MAX_INPUT_SIZE']} пикселей по стороне."
+        )
+    if min(width, height) < options["MIN_SIZE"]:
+        raise serializers.ValidationError(
+            f"Размер изображения не может быть меньше "
+            f"{options['MIN_SIZE']} пикселей по стороне."
+        )
+    try:
+        # Поворачиваем по EXIF до того, как метаданные будут отброшены.
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (options["MAX_SIZE"], options["MAX_SIZE"]), Image.LANCZOS
+        )
+    except OSError:
+        raise serializers.ValidationError(
+            "Загрузите корректное изображение."
+        )
+    return ContentFile(
+        _encode(image), name=f"{uuid.uuid4()}.{_extension()}"
+    )
+
+
+def thumbnail_name(name, size):
+    root = os.path.splitext(name)[0]
+    return f"{root}_{size}.{_extension()}"
+
+
+def save_thumbnails(storage, name, content):
+    content.seek(0)
+    with Image.open(content) as source:
+        source.load()
+        for size in _options()["THUMBNAIL_SIZES"].values():
+            thumb_name = thumbnail_name(name, size)
+            # Превью выводится из имени оригинала и не меняется.
+            if storage.exists(thumb_name):
+                continue
+            image = source.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            storage.save(thumb_name, ContentFile(_encode(image)))
+
+
+def thumbnail_names(name):
+    return [
+        thumbnail_name(name, size)
+        for size in _options()["THUMBNAIL_SIZES"].values()
+    ]
+
+
+def thumbnail_urls(storage, name):
+    return {
+        label: storage.url(thumbnail_name(name, size))
+        for label, size in _options()["THUMBNAIL_SIZES"].items()
+    }
+
+
+class ThumbnailImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        if not isinstance(self.storage, ContentAddressedStorage):
+            super().save(name, content, save=save)
+            save_thumbnails(self.storage, self.name, content)
+            return
+        name = self.storage.get_content_name(
+            self.field.generate_filename(self.instance, name), content
+        )
+        with hold(name):
+            self.name = self.storage.save(
+                name, content, max_length=self.field.max_length
+            )
+            save_thumbnails(self.storage, self.name, content)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+    def delete(self, save=True):
+        # Файл может использоваться другими объектами: он будет удален,
+        # когда на него не останется ссылок (см. ThumbnailImageField).
+        if not self:
+            return
+        if hasattr(self, "_file"):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        if save:
+            self.instance.save()
+
+    delete.alters_data = True
+
+    @property
+    def thumbnails(self):
+        return thumbnail_urls(self.storage, self.name)
+
+
+class ThumbnailImageField(ImageField):
+    """
+    ImageField, который рядом с картинкой хранит уменьшенные копии
+    и считает ссылки на файл, удаляя его вместе с последней.
+    """
+    attr_class = ThumbnailImageFieldFile
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            signals.post_init.connect(self.remember_name, sender=cls)
+            signals.post_save.connect(self.update_references, sender=cls)
+            signals.post_delete.connect(self.release_file, sender=cls)
+
+    @property
+    def saved_name_attr(self):
+        return f"_{self.attname}_saved_name"
+
+    def get_file_name(self, instance):
+        value = instance.__dict__.get(self.attname)
+        return getattr(value, "name", value) or None
+
+    def remember_name(self, instance, **kwargs):
+        if self.attname in instance.__dict__:
+            instance.__dict__[self.saved_name_attr] = (
+                self.get_file_name(instance)
+            )
+
+    def update_references(self, instance, created, raw, **kwargs):
+        if raw or self.attname not in instance.__dict__:
+            return
+        if not created and self.saved_name_attr not in instance.__dict__:
+            return
+        old_name = (
+            None if created else instance.__dict__[self.saved_name_attr]
+        )
+        new_name = self.get_file_name(instance)
+        instance.__dict__[self.saved_name_attr] = new_name
+        if old_name == new_name:
+            return
+        if new_name:
+            acquire(new_name)
+        if old_name:
+            release(self.storage, old_name, thumbnail_names(old_name))
+
+    def release_file(self, instance, **kwargs):
+        name = self.get_file_name(instance)
+        if name:
+            release(self.storage, name, thumbnail_names(name))
@@ -0,0 +1,270 @@
+import json
+import platform
+import statistics
+import tempfile
+import time
+from urllib.parse import quote
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.synthetic import generate
+from users.models import User
+from utils.queries import QueryCounter
+from utils.testing import png_data_url
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк горячих эндпоинтов API на синтетических данных. "
+        "Данные создаются в транзакции и откатываются, кэш локальный. "
+        "Результат в JSON можно сравнить с прошлой сборкой (--baseline)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--subscriptions", type=int, default=20)
+        parser.add_argument("--favorites", type=int, default=30)
+        parser.add_argument("--cart", type=int, default=15)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--iterations", type=int, default=20, help="Повторов на сценарий"
+        )
+        parser.add_argument("--output", help="Файл для результата в JSON")
+        parser.add_argument(
+            "--baseline", help="JSON прошлого запуска для сравнения"
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.25,
+            help="Допустимый рост медианы относительно --baseline",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 2:
+            raise CommandError("Нужно хотя бы два повтора.")
+        self.iterations = options["iterations"]
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    THROTTLE_ENABLED=False,
+                    CACHES={
+                        "default": {
+                            "BACKEND": "django.core.cache.backends."
+                            "locmem.LocMemCache",
+                        },
+                    },
+                ):
+                    scenarios = self.run_benchmarks(options)
+        finally:
+            teardown_test_environment()
+
+        result = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "parameters": {
+                    name: options[name]
+                    for name in (
+                        "users",
+                        "recipes",
+                        "ingredients_per_recipe",
+                        "subscriptions",
+                        "favorites",
+                        "cart",
+                        "seed",
+                        "iterations",
+                    )
+                },
+            },
+            "scenarios": scenarios,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(result, file, indent=2, ensure_ascii=False)
+        if options["baseline"]:
+            self.compare(
+                scenarios, options["baseline"], options["max_regression"]
+            )
+
+    def run_benchmarks(self, options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            data = generate(
+                users=options["users"],
+                recipes=options["recipes"],
+                ingredients_per_recipe=options["ingredients_per_recipe"],
+                subscriptions_per_user=options["subscriptions"],
+                favorites_per_user=options["favorites"],
+                cart_per_user=options["cart"],
+                seed=options["seed"],
+            )
+            self.stdout.write(
+                f"Данные созданы за {time.perf_counter() - started:.1f} с"
+            )
+            user = User.objects.get(id=data.user_ids[0])
+            clients = {"anon": APIClient(), "auth": APIClient()}
+            clients["auth"].credentials(
+                HTTP_AUTHORIZATION=(
+                    f"Token {Token.objects.create(user=user).key}"
+                )
+            )
+            recipe = Recipe.objects.get(id=data.recipe_ids[0])
+            search = quote(data.ingredients[0].name[:2])
+            recipe_data = {
+                "name": "Бенчмарк",
+                "text": "Текст",
+                "cooking_time": 5,
+                "tags": [tag.id for tag in data.tags[:2]],
+                "ingredients": [
+                    {"id": ingredient.id, "amount": 10}
+                    for ingredient in data.ingredients[:8]
+                ],
+                "image": png_data_url(),
+            }
+            # (имя, клиент, метод, путь, тело)
+            scenarios = [
+                ("recipes_list_anon", "anon", "get", "/api/recipes/", None),
+                ("recipes_list_auth", "auth", "get", "/api/recipes/", None),
+                (
+                    "recipes_list_filtered",
+                    "auth",
+                    "get",
+                    f"/api/recipes/?tags={data.tags[0].slug}"
+                    f"&is_favorited=1&limit=6",
+                    None,
+                ),
+                (
+                    "recipes_list_author",
+                    "anon",
+                    "get",
+                    f"/api/recipes/?author={recipe.author_id}",
+                    None,
+                ),
+                (
+                    "recipe_retrieve",
+                    "auth",
+                    "get",
+                    f"/api/recipes/{recipe.id}/",
+                    None,
+                ),
+                (
+                    "download_shopping_cart",
+                    "auth",
+                    "get",
+                    "/api/recipes/download_shopping_cart/",
+                    None,
+                ),
+                (
+                    "subscriptions",
+                    "auth",
+                    "get",
+                    "/api/users/subscriptions/?recipes_limit=3",
+                    None,
+                ),
+                (
+                    "ingredient_search",
+                    "anon",
+                    "get",
+                    f"/api/ingredients/?name={search}",
+                    None,
+                ),
+                (
+                    "recipe_create",
+                    "auth",
+                    "post",
+                    "/api/recipes/",
+                    recipe_data,
+                ),
+            ]
+            results = {}
+            for name, client, method, path, body in scenarios:
+                results[name] = self.run_scenario(
+                    name, clients[client], method, path, body
+                )
+            transaction.set_rollback(True)
+        return results
+
+    def run_scenario(self, name, client, method, path, body):
+        result = {"path": path, "method": method.upper()}
+        # Чтения меряются с пустым и с прогретым кэшем, запись - один раз.
+        modes = ("cold", "warm") if method == "get" else ("cold",)
+        for mode in modes:
+            if mode == "warm":
+                cache.clear()
+                self.request(client, method, path, body)
+            timings = []
+            for _ in range(self.iterations):
+                if mode == "cold":
+                    cache.clear()
+                with transaction.atomic():
+                    with QueryCounter() as counter:
+                        started = time.perf_counter()
+                        response = self.request(client, method, path, body)
+                        timings.append(time.perf_counter() - started)
+                    transaction.set_rollback(True)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"{name}: ответ {response.status_code}"
+                )
+            result[mode] = {
+                "status": response.status_code,
+                "queries": counter.count,
+                "mean_ms": statistics.fmean(timings) * 1000,
+                "median_ms": statistics.median(timings) * 1000,
+                "p95_ms": statistics.quantiles(timings, n=20)[-1] * 1000,
+                "min_ms": min(timings) * 1000,
+                "max_ms": max(timings) * 1000,
+            }
+            self.stdout.write(
+                f"{name} ({mode}): медиана "
+                f"{result[mode]['median_ms']:.2f} мс, p95 "
+                f"{result[mode]['p95_ms']:.2f} мс, "
+                f"{counter.count} запросов"
+            )
+        return result
+
+    def request(self, client, method, path, body):
+        if body is None:
+            return getattr(client, method)(path)
+        return getattr(client, method)(path, data=body, format="json")
+
+    def compare(self, scenarios, baseline_path, max_regression):
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)["scenarios"]
+        regressions = []
+        for name, result in scenarios.items():
+            for mode in ("cold", "warm"):
+                old = baseline.get(name, {}).get(mode)
+                if mode not in result or old is None:
+                    continue
+                ratio = result[mode]["median_ms"] / old["median_ms"]
+                self.stdout.write(
+                    f"{name} ({mode}): {ratio:.2f}x к базовой, запросов "
+                    f"{old['queries']} -> {result[mode]['queries']}"
+                )
+                if (
+                    ratio > 1 + max_regression
+                    or result[mode]["queries"] > old["queries"]
+                ):
+                    regressions.append(f"{name} ({mode})")
+        if regressions:
+            raise CommandError("Регрессии: " + ", ".join(regressions))
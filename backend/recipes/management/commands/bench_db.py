@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка запросов с постоянными соединениями к базе и без них "
+        "(полный цикл запроса, как в воркере gunicorn)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default="/api/users/", help="Путь для запросов"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Запросов на режим"
+        )
+        parser.add_argument(
+            "--conn-max-age",
+            type=int,
+            default=60,
+            help="CONN_MAX_AGE для режима с постоянными соединениями",
+        )
+
+    def handle(self, *args, **options):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != "*"),
+            "localhost",
+        ).lstrip(".")
+        environ = RequestFactory(HTTP_HOST=host).get(options["path"]).environ
+        handler = WSGIHandler()
+        settings_dict = connections["default"].settings_dict
+        original = settings_dict["CONN_MAX_AGE"]
+        created = []
+
+        def count_connection(sender, **kwargs):
+            created.append(sender)
+
+        connection_created.connect(count_connection)
+        try:
+            for max_age in (0, options["conn_max_age"]):
+                settings_dict["CONN_MAX_AGE"] = max_age
+                connections["default"].close()
+                created.clear()
+                latencies = []
+                for _ in range(options["requests"]):
+                    started = time.perf_counter()
+                    response = handler(dict(environ), lambda *args: None)
+                    b"".join(response)
+                    # Как сервер: close() отправляет request_finished,
+                    # и старые соединения закрываются.
+                    response.close()
+                    latencies.append(time.perf_counter() - started)
+                latencies.sort()
+                self.stdout.write(
+                    f"CONN_MAX_AGE={max_age}: статус {response.status_code}, "
+                    f"среднее {statistics.fmean(latencies) * 1000:.2f} мс, "
+                    f"p50 {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+                    f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} "
+                    f"мс, соединений {len(created)}"
+                )
+        finally:
+            connection_created.disconnect(count_connection)
+            settings_dict["CONN_MAX_AGE"] = original
@@ -0,0 +1,75 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import Recipe
+from recipes.serializers import RecipeReadSerializer
+from utils.renderers import FastJSONRenderer, orjson
+
+RENDERERS = (JSONRenderer, FastJSONRenderer)
+
+
+class Command(BaseCommand):
+    help = "Сравнение скорости JSON-рендереров на странице рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=100,
+            help="Рецептов на странице (имеющиеся повторяются)",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=200, help="Число повторов"
+        )
+
+    def handle(self, *args, **options):
+        recipes = list(Recipe.objects.order_by("id")[:options["recipes"]])
+        if not recipes:
+            raise CommandError("В базе нет рецептов.")
+        recipes = list(
+            itertools.islice(itertools.cycle(recipes), options["recipes"])
+        )
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.version = "1.0"
+        data = {
+            "count": len(recipes),
+            "next": None,
+            "previous": None,
+            "results": RecipeReadSerializer(
+                recipes, many=True, context={"request": request}
+            ).data,
+        }
+        if orjson is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    "orjson не установлен, FastJSONRenderer работает "
+                    "как стандартный."
+                )
+            )
+
+        results = {}
+        for renderer_class in RENDERERS:
+            renderer = renderer_class()
+            content = renderer.render(data, "application/json")
+            started = time.perf_counter()
+            for _ in range(options["iterations"]):
+                renderer.render(data, "application/json")
+            elapsed = time.perf_counter() - started
+            results[renderer_class.__name__] = (content, elapsed)
+            self.stdout.write(
+                f"{renderer_class.__name__}: "
+                f"{elapsed / options['iterations'] * 1000:.3f} мс "
+                f"({len(content)} байт)"
+            )
+
+        (base, base_time), (fast, fast_time) = results.values()
+        if base != fast:
+            raise CommandError("Результаты рендереров отличаются.")
+        self.stdout.write(
+            self.style.SUCCESS(f"Ускорение: {base_time / fast_time:.1f}x")
+        )
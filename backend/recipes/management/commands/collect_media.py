@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import thumbnail_names
+from recipes.models import MediaFile
+from recipes.storage import release
+
+
+class Command(BaseCommand):
+    help = "Удаление загруженных, но так и не использованных файлов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--age",
+            type=int,
+            default=60,
+            help="Минимальный возраст файла в минутах. По умолчанию 60.",
+        )
+
+    def handle(self, *args, **options):
+        # Свежие файлы могут принадлежать запросам, которые еще идут.
+        created_before = timezone.now() - timedelta(minutes=options["age"])
+        names = MediaFile.objects.filter(
+            references=0, created_at__lt=created_before
+        ).values_list("name", flat=True)
+        count = 0
+        for name in names:
+            release(default_storage, name, thumbnail_names(name))
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Удалено неиспользуемых файлов: {count}")
+        )
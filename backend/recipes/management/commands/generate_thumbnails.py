@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import save_thumbnails
+from recipes.models import Recipe
+from users.models import User
+
+IMAGE_FIELDS = (
+    (Recipe, "image"),
+    (User, "avatar"),
+)
+
+
+class Command(BaseCommand):
+    help = "Генерация превью для уже загруженных картинок"
+
+    def handle(self, *args, **options):
+        for model, field_name in IMAGE_FIELDS:
+            names = set(
+                model.objects.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list(field_name, flat=True)
+            )
+            storage = model._meta.get_field(field_name).storage
+            for name in names:
+                if not storage.exists(name):
+                    self.stdout.write(
+                        self.style.WARNING(f"Файл {name} не найден.")
+                    )
+                    continue
+                with storage.open(name) as content:
+                    save_thumbnails(storage, name, content)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Превью для {model.__name__} готовы: {len(names)}"
+                )
+            )
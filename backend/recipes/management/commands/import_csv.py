@@ -6,6 +6,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
+from utils.cache import bump_version
 
 CSV_FILES_MAP = {
     Ingredient: "ingredients.csv",
@@ -62,6 +63,8 @@ class Command(BaseCommand):
                 )
             )
 
+        # bulk_create не отправляет post_save, сбрасываем кэш вручную.
+        bump_version("ingredients")
         self.stdout.write(
             self.style.SUCCESS("Импорт всех данных успешно завершен.")
         )
@@ -0,0 +1,115 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ("/api/tags/", "/api/ingredients/?name=%D1%81")
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест запущенного сервера: запустите его для профилей "
+        "wsgi и asgi (SERVER_PROFILE) и сравните результаты"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000", help="Адрес сервера"
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Путь для проверки, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Число клиентов"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Секунд на путь"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести результат в JSON"
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Поддерживается только http://host[:port].")
+        results = {}
+        for path in options["paths"] or DEFAULT_PATHS:
+            results[path] = self.run(
+                url.hostname,
+                url.port or 80,
+                path,
+                options["concurrency"],
+                options["duration"],
+            )
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for path, result in results.items():
+            self.stdout.write(
+                f"{path}: {result['rps']:.0f} запр/с, "
+                f"p50 {result['p50']:.1f} мс, p95 {result['p95']:.1f} мс, "
+                f"p99 {result['p99']:.1f} мс, ошибок {result['errors']}"
+            )
+
+    def run(self, host, port, path, concurrency, duration):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client():
+            # Одно keep-alive соединение на клиента, как у браузера.
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            own_latencies = []
+            own_errors = 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", path)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    own_errors += 1
+                    connection.close()
+                    continue
+                own_latencies.append(time.perf_counter() - started)
+                if response.status >= 400:
+                    own_errors += 1
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        threads = [
+            threading.Thread(target=client) for _ in range(concurrency)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "errors": sum(errors),
+        }
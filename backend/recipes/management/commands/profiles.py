@@ -0,0 +1,119 @@
+import glob
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Список профилей запросов из PROFILER_DIR и их объединение "
+        "в один файл свернутых стеков для flamegraph"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory", default=settings.PROFILER_DIR, help="Каталог"
+        )
+        parser.add_argument(
+            "--path",
+            help=(
+                "Только запросы, путь которых "
+                "содержит фрагмент, например "
+                "/api/recipes/"
+            ),
+        )
+        parser.add_argument("--method", help="Только запросы с методом")
+        parser.add_argument(
+            "--min-duration",
+            type=int,
+            default=0,
+            help="Только запросы не короче стольких миллисекунд",
+        )
+        parser.add_argument(
+            "--aggregate",
+            metavar="FILE",
+            help="Сложить стеки выбранных профилей в файл (- для stdout)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=0,
+            help="Показать столько самых затратных функций",
+        )
+
+    def handle(self, *args, **options):
+        profiles = self.find(options)
+        if not profiles:
+            raise CommandError("Профилей не найдено.")
+        if not options["aggregate"] and not options["top"]:
+            for path, match in profiles:
+                self.stdout.write(
+                    f"{match['time']}  {match['method']:6} "
+                    f"{int(match['duration']):>6} мс  "
+                    f"{match['path']}  {os.path.basename(path)}"
+                )
+            return
+
+        stacks = Counter()
+        for path, _ in profiles:
+            stacks.update(profiling.read(path))
+        if options["aggregate"]:
+            lines = [
+                f"{stack} {count}\n" for stack, count in stacks.most_common()
+            ]
+            if options["aggregate"] == "-":
+                self.stdout.write("".join(lines), ending="")
+            else:
+                with open(
+                    options["aggregate"], "w", encoding="utf-8"
+                ) as file:
+                    file.writelines(lines)
+                self.stdout.write(
+                    f"Сложено профилей: {len(profiles)}, "
+                    f"стеков: {len(stacks)}"
+                )
+        if options["top"]:
+            self.show_top(stacks, options["top"])
+
+    def find(self, options):
+        profiles = []
+        slug = options["path"] and profiling.path_slug(options["path"])
+        pattern = os.path.join(
+            options["directory"], f"*{profiling.FILE_SUFFIX}"
+        )
+        for path in sorted(glob.glob(pattern)):
+            match = profiling.FILE_NAME_RE.match(os.path.basename(path))
+            if match is None:
+                continue
+            if slug and slug not in match["path"]:
+                continue
+            if (
+                options["method"]
+                and match["method"] != options["method"].upper()
+            ):
+                continue
+            if int(match["duration"]) < options["min_duration"]:
+                continue
+            profiles.append((path, match))
+        return profiles
+
+    def show_top(self, stacks, limit):
+        # Собственное время - последний кадр стека, общее - любой кадр.
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        weight = sum(stacks.values())
+        self.stdout.write(f"{'собств.':>8} {'всего':>8}  функция")
+        for frame, count in own.most_common(limit):
+            self.stdout.write(
+                f"{count / weight:8.1%} {total[frame] / weight:8.1%}  "
+                f"{frame}"
+            )
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.14 on 2026-10-19 07:15
+
+from django.db import migrations
+
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0018_alter_recipeingredient_ingredient"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=recipes.images.ThumbnailImageField(
+                upload_to="recipes/images/", verbose_name="Картинка"
+            ),
+        ),
+    ]
@@ -13,6 +13,7 @@ from .constants import (
     MIN_COOKING_TIME,
     RECIPES_MAX_NAME,
 )
+from .images import ThumbnailImageField
 
 User = get_user_model()
 
@@ -25,6 +26,25 @@ class ShortLink(models.Model):
         return f"{self.short_code} -> {self.long_url}"
 
 
+class MediaFile(models.Model):
+    name = models.CharField(
+        max_length=255, unique=True, verbose_name="Имя файла"
+    )
+    references = models.PositiveIntegerField(
+        default=0, verbose_name="Кол-во ссылок"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Дата загрузки"
+    )
+
+    class Meta:
+        verbose_name = "Медиафайл"
+        verbose_name_plural = "Медиафайлы"
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
 class Ingredient(models.Model):
     name = models.CharField(
         max_length=INGREDIENT_NAME_MAX, verbose_name="Название"
@@ -32,6 +52,9 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=MEASUREMENT_UNIT_MAX, verbose_name="Ед. измерения"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Дата изменения"
+    )
 
     class Meta:
         verbose_name = "Ингридиент"
@@ -103,7 +126,7 @@ class Recipe(models.Model):
         verbose_name="Автор",
     )
     name = models.CharField(max_length=RECIPES_MAX_NAME, verbose_name="Имя")
-    image = models.ImageField(
+    image = ThumbnailImageField(
         upload_to="recipes/images/", verbose_name="Картинка"
     )
     text = models.TextField(verbose_name="Текст")
@@ -128,6 +151,9 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag, related_name="recipes", verbose_name="Тэги"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Дата изменения"
+    )
 
     class Meta:
         verbose_name = "Рецепт"
@@ -0,0 +1,23 @@
+import uuid
+
+from rest_framework.parsers import DataAndFiles, FileUploadParser
+
+
+class ImageUploadParser(FileUploadParser):
+    """
+    Принимает картинку телом запроса, без base64 и multipart.
+    """
+    media_type = "image/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        data_and_files = super().parse(stream, media_type, parser_context)
+        view = (parser_context or {}).get("view")
+        field_name = getattr(view, "image_upload_field", "image")
+        return DataAndFiles({}, {field_name: data_and_files.files["file"]})
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        subtype = parser_context["request"].content_type.split("/")[-1]
+        return f"{uuid.uuid4()}.{subtype.split(';')[0].strip()}"
@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
@@ -7,9 +10,13 @@ from rest_framework.serializers import ModelSerializer
 from tags.serializers import Tag, TagSerializer
 from django.shortcuts import get_object_or_404
 from users.models import Subscription, User
+from users.builders import get_subscriptions
 from users.serializers import UserSerializer
+from utils.cache import cache_many
+from utils.fieldsets import SparseFieldsetMixin
 
-from .fields import Base64ImageField
+from .builders import RECIPE_EXPANDABLE, RECIPE_FIELDS, build_recipes
+from .fields import Base64ImageField, ThumbnailsField
 from .models import (
     Favorite,
     Ingredient,
@@ -18,6 +25,9 @@ from .models import (
     ShoppingCart,
 )
 
+# Фрагмент рецепта включает теги, ингредиенты и автора.
+RECIPE_FRAGMENT_TAGS = ("tags", "ingredients", "users")
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -40,6 +50,18 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
+class RecipeIngredientAmountSerializer(serializers.ModelSerializer):
+    """Ингредиент рецепта без ?expand=ingredients."""
+
+    id = serializers.PrimaryKeyRelatedField(
+        source="ingredient", read_only=True
+    )
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ("id", "amount")
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
@@ -110,6 +132,8 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         return data
 
+    # Иначе рецепт без ингредиентов может попасть в кэш фрагментов.
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("recipeingredient_set", [])
         tags_data = validated_data.pop("tags", [])
@@ -189,7 +213,14 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return RecipeReadSerializer(instance).data
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        return render_recipes(list(data), self.context, *self.child.fieldset)
+
+
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         source="recipeingredient_set", many=True
@@ -223,6 +254,18 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "text": {"required": True},
             "cooking_time": {"required": True},
         }
+        list_serializer_class = RecipeListSerializer
+
+    expandable_fields = ("author", "tags", "ingredients")
+
+    def get_collapsed_field(self, name):
+        if name == "ingredients":
+            return RecipeIngredientAmountSerializer(
+                source="recipeingredient_set", many=True, read_only=True
+            )
+        return serializers.PrimaryKeyRelatedField(
+            many=name == "tags", read_only=True
+        )
 
     def get_is_subscribed(self, obj):
         user = self.context["request"].user
@@ -237,31 +280,144 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             )
         return ""
 
+    # Флаги пользователя подставляются поверх закэшированного фрагмента,
+    # см. render_recipes.
     def check_is_in_shopping_cart(self, obj):
-        if self.context.get("request") is None:
-            return False
+        return obj.id in self.context.get("shopping_cart", ())
 
-        if self.context.get("request").user.is_authenticated:
-            return (
-                self.context.get("request")
-                .user.recipes_shopping_cart.filter(recipe=obj)
-                .exists()
-            )
+    def check_is_in_favourited(self, obj):
+        return obj.id in self.context.get("favorites", ())
 
-        return False
+    def to_representation(self, instance):
+        return render_recipes([instance], self.context, *self.fieldset)[0]
 
-    def check_is_in_favourited(self, obj):
-        if self.context.get("request") is None:
-            return False
 
-        user = self.context.get("request").user
-        if (
-            user.is_authenticated
-            and user.favorites.filter(recipe=obj).exists()
-        ):
-            return True
+class RecipeCardSerializer(RecipeReadSerializer):
+    """Рецепт в списках API 2.0: миниатюры вместо ингредиентов и текста."""
 
-        return False
+    thumbnails = ThumbnailsField(source="image")
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = (
+            "id",
+            "tags",
+            "author",
+            "is_favorited",
+            "name",
+            "image",
+            "thumbnails",
+            "cooking_time",
+            "is_in_shopping_cart",
+        )
+
+
+def get_user_flags(
+    user, recipes, fields=RECIPE_FIELDS, expanded=RECIPE_EXPANDABLE
+):
+    """
+    Избранное, корзина и подписки пользователя для набора рецептов -
+    по одному запросу на каждое, если флаг есть среди полей ответа.
+    """
+    favorites = shopping_cart = subscriptions = frozenset()
+    if user is None or not user.is_authenticated:
+        return favorites, shopping_cart, subscriptions
+    recipe_ids = {recipe.id for recipe in recipes}
+    if "is_favorited" in fields:
+        favorites = set(
+            Favorite.objects.filter(
+                user=user, recipe__in=recipe_ids
+            ).values_list("recipe_id", flat=True)
+        )
+    if "is_in_shopping_cart" in fields:
+        shopping_cart = set(
+            ShoppingCart.objects.filter(
+                user=user, recipe__in=recipe_ids
+            ).values_list("recipe_id", flat=True)
+        )
+    if "author" in fields and "author" in expanded:
+        subscriptions = get_subscriptions(
+            user, {recipe.author_id for recipe in recipes}
+        )
+    return favorites, shopping_cart, subscriptions
+
+
+def serialize_recipes(
+    recipes, context, serializer_class=RecipeReadSerializer
+):
+    """
+    Общая часть RecipeReadSerializer через поля DRF. Ответы собирает
+    build_recipes, эта версия - эталон для tests.test_builders.
+    """
+    # Порядок тегов и ингредиентов тот же, что у build_recipes.
+    prefetch_related_objects(
+        recipes,
+        "author",
+        Prefetch("tags", queryset=Tag.objects.order_by("id")),
+        Prefetch(
+            "recipeingredient_set",
+            queryset=RecipeIngredient.objects.select_related(
+                "ingredient"
+            ).order_by("pk"),
+        ),
+    )
+    serializer = serializer_class(
+        context={
+            **context,
+            "favorites": frozenset(),
+            "shopping_cart": frozenset(),
+            "subscriptions": frozenset(),
+        }
+    )
+    return [
+        ModelSerializer.to_representation(serializer, recipe)
+        for recipe in recipes
+    ]
+
+
+def render_recipes(
+    recipes, context, fields=RECIPE_FIELDS, expanded=RECIPE_EXPANDABLE
+):
+    """
+    Сериализует рецепты через кэш фрагментов: общая для всех часть
+    хранится по id и дате изменения рецепта, флаги пользователя
+    подставляются поверх.
+    """
+    request = context.get("request")
+    # Ссылки на картинки абсолютные и зависят от адреса сайта.
+    host = request.build_absolute_uri("/") if request else None
+    version = getattr(request, "version", None)
+    fragments = cache_many(
+        "recipe",
+        recipes,
+        lambda recipe: (
+            recipe.id,
+            recipe.updated_at,
+            host,
+            version,
+            fields,
+            sorted(expanded),
+        ),
+        lambda missing: build_recipes(missing, request, fields, expanded),
+        timeout=settings.RECIPE_CACHE_TIMEOUT,
+        tags=RECIPE_FRAGMENT_TAGS,
+    )
+    favorites, shopping_cart, subscriptions = get_user_flags(
+        getattr(request, "user", None), recipes, fields, expanded
+    )
+    result = []
+    for recipe, fragment in zip(recipes, fragments):
+        data = dict(fragment)
+        if "author" in data and "author" in expanded:
+            data["author"] = {
+                **fragment["author"],
+                "is_subscribed": recipe.author_id in subscriptions,
+            }
+        if "is_favorited" in data:
+            data["is_favorited"] = recipe.id in favorites
+        if "is_in_shopping_cart" in data:
+            data["is_in_shopping_cart"] = recipe.id in shopping_cart
+        result.append(data)
+    return result
 
 
 class RecipeLimitedFieldsSerializer(serializers.ModelSerializer):
@@ -296,11 +452,12 @@ class RecipeLimitedFieldsSerializer(serializers.ModelSerializer):
         }
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class SubscribeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.ReadOnlyField(source="recipes.count")
     avatar = serializers.SerializerMethodField()
+    avatar_thumbnails = ThumbnailsField(source="avatar")
 
     class Meta:
         model = User
@@ -314,9 +471,15 @@ class SubscribeSerializer(serializers.ModelSerializer):
             "recipes",
             "recipes_count",
             "avatar",
+            "avatar_thumbnails",
         )
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
+    expandable_fields = ("recipes",)
+
+    def get_collapsed_field(self, name):
+        return serializers.SerializerMethodField("get_recipe_ids")
+
     def get_is_subscribed(self, obj):
         request = self.context.get("request")
         if request and request.user.is_authenticated:
@@ -336,6 +499,13 @@ class SubscribeSerializer(serializers.ModelSerializer):
         )
         return serializer.data
 
+    def get_recipe_ids(self, obj):
+        limit = self.context["request"].GET.get("recipes_limit")
+        recipe_ids = obj.recipes.order_by("pk").values_list("pk", flat=True)
+        if limit:
+            recipe_ids = recipe_ids[: int(limit)]
+        return list(recipe_ids)
+
     def get_avatar(self, obj):
         if obj.avatar:
             return self.context["request"].build_absolute_uri(
@@ -444,6 +614,7 @@ class CustomUserSerializer(UserSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_thumbnails",
         )
         extra_kwargs = {
             "id": {"required": True},
@@ -467,16 +638,27 @@ class CustomUserSerializer(UserSerializer):
 
 class RecipeCustSerializer(ModelSerializer):
     image = Base64ImageField()
+    thumbnails = ThumbnailsField(source="image")
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "thumbnails", "cooking_time")
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    image = Base64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ("image",)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    thumbnails = ThumbnailsField(source="image")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "thumbnails", "cooking_time")
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
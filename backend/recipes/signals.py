@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from tags.models import Tag
+from utils.cache import invalidate_tags
+
+from .models import Ingredient, Recipe
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    invalidate_tags("ingredients", "recipes")
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Tag)
+def recipes_changed(sender, **kwargs):
+    invalidate_tags("recipes")
+
+
+# Поля автора, которые входят в ответы с рецептами.
+AUTHOR_FIELDS = frozenset(
+    ("email", "username", "first_name", "last_name", "avatar")
+)
+AUTHOR_SNAPSHOT_ATTR = "_author_fields"
+
+
+def author_fields(instance):
+    # Через __dict__: отложенные поля (.only) не загружаются.
+    values = instance.__dict__
+    return {
+        name: getattr(values[name], "name", values[name])
+        for name in AUTHOR_FIELDS
+        if name in values
+    }
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(sender, instance, **kwargs):
+    instance.__dict__[AUTHOR_SNAPSHOT_ATTR] = author_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    # У нового пользователя рецептов нет, а вход, смена пароля и прочие
+    # поля не видны в ответах с рецептами.
+    if created:
+        return
+    names = AUTHOR_FIELDS & set(update_fields or AUTHOR_FIELDS)
+    saved = instance.__dict__.get(AUTHOR_SNAPSHOT_ATTR, {})
+    current = author_fields(instance)
+    instance.__dict__[AUTHOR_SNAPSHOT_ATTR] = {**saved, **current}
+    # Поля, которых нет в снимке, считаем измененными.
+    if all(
+        name in saved and saved[name] == current.get(name) for name in names
+    ):
+        return
+    if instance.recipes.exists():
+        invalidate_tags("recipes", "users")
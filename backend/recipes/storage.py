@@ -0,0 +1,102 @@
+import hashlib
+import os
+import pathlib
+import re
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# Оригинал или его превью: <sha256>.<ext> или <sha256>_<размер>.<ext>.
+CONTENT_NAME_RE = re.compile(r"(^|/)[0-9a-f]{64}(_[0-9]+)?\.[a-z]+$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла - хеш его содержимого.
+    """
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        dir_name, file_name = os.path.split(name)
+        ext = os.path.splitext(file_name)[1]
+        return os.path.join(dir_name, f"{digest.hexdigest()}{ext}")
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое,
+        # поэтому суффиксы к существующим файлам не добавляем.
+        name = str(name).replace("\\", "/")
+        dir_name, file_name = os.path.split(name)
+        if ".." in pathlib.PurePath(dir_name).parts:
+            raise SuspiciousFileOperation(
+                f"Detected path traversal attempt in '{dir_name}'"
+            )
+        validate_file_name(file_name)
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def _media_files():
+    return apps.get_model("recipes", "MediaFile").objects
+
+
+@contextmanager
+def hold(name):
+    """
+    Блокирует учетную запись файла, пока он записывается на диск.
+    """
+    with transaction.atomic():
+        _media_files().select_for_update().get_or_create(name=name)
+        yield
+
+
+def acquire(name):
+    # Файлы без учетной записи (картинка по умолчанию, старые загрузки)
+    # не отслеживаются и никогда не удаляются.
+    _media_files().filter(name=name).update(references=F("references") + 1)
+
+
+def release(storage, name, derived_names=()):
+    with transaction.atomic():
+        media_file = (
+            _media_files().select_for_update().filter(name=name).first()
+        )
+        if media_file is None:
+            return
+        if media_file.references > 1:
+            media_file.references = F("references") - 1
+            media_file.save(update_fields=["references"])
+            return
+        media_file.delete()
+        # Файлы удаляем только после коммита: при откате транзакции
+        # учетная запись вернется и будет ссылаться на пустое место.
+        transaction.on_commit(
+            lambda: _delete_files(storage, name, list(derived_names))
+        )
+
+
+def _delete_files(storage, name, derived_names):
+    # Временная учетная запись работает как блокировка hold():
+    # параллельная загрузка того же содержимого подождет удаления.
+    try:
+        with transaction.atomic():
+            media_file = _media_files().create(name=name)
+            for derived_name in derived_names:
+                storage.delete(derived_name)
+            storage.delete(name)
+            media_file.delete()
+    except IntegrityError:
+        # Файл успели загрузить заново.
+        pass
@@ -0,0 +1,298 @@
+"""
+Синтетические данные для бенчмарков и нагрузочных тестов: пользователи,
+рецепты с ингредиентами и тегами, подписки, избранное и корзины.
+
+Популярность авторов, рецептов и ингредиентов распределена по Ципфу:
+немногие получают большую часть подписок, избранного и упоминаний,
+как в настоящей базе. Каждый этап берет свой генератор от seed, поэтому
+одинаковые параметры дают одинаковые данные.
+"""
+import csv
+import io
+import itertools
+import os
+import random
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+
+from tags.models import Tag
+from users.models import Subscription, User
+
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+
+# Файл картинки не создается: для чтения достаточно имени.
+IMAGE_NAME = "recipes/images/synthetic.png"
+BATCH_SIZE = 5000
+MIN_TAGS = 3
+ZIPF_EXPONENT = 1.1
+# Сколько раз добирать недостающие элементы при выборке без повторов:
+# хвост распределения выпадает редко.
+SAMPLE_ROUNDS = 20
+
+
+@dataclass
+class SyntheticData:
+    user_ids: list = field(default_factory=list)
+    recipe_ids: list = field(default_factory=list)
+    tags: list = field(default_factory=list)
+    ingredients: list = field(default_factory=list)
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Накопленные веса для random.choices: вес k-го - 1 / k^exponent."""
+    return list(
+        itertools.accumulate(
+            1 / rank ** exponent for rank in range(1, count + 1)
+        )
+    )
+
+
+def zipf_sample(rng, population, cum_weights, count):
+    """До count разных элементов, популярные выпадают чаще."""
+    count = min(count, len(population))
+    chosen = set()
+    for _ in range(SAMPLE_ROUNDS):
+        if len(chosen) >= count:
+            break
+        chosen.update(
+            rng.choices(
+                population, cum_weights=cum_weights, k=count - len(chosen)
+            )
+        )
+    return chosen
+
+
+def activity(rng, mean):
+    # Экспоненциальное распределение: большинство пользователей почти
+    # ничего не добавляет, немногие - очень много.
+    return int(rng.expovariate(1 / mean)) if mean > 0 else 0
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def insert(model, fields, rows, batch_size=BATCH_SIZE):
+    """
+    Вставляет кортежи значений пачками, не держа все строки в памяти:
+    в PostgreSQL через COPY, в остальных базах через bulk_create.
+    """
+    model_fields = [model._meta.get_field(name) for name in fields]
+    columns = ", ".join(model_field.column for model_field in model_fields)
+    attnames = [model_field.attname for model_field in model_fields]
+    total = 0
+    for batch in chunks(rows, batch_size):
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {model._meta.db_table} ({columns}) "
+                    f"FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+        else:
+            model.objects.bulk_create(
+                [model(**dict(zip(attnames, row))) for row in batch]
+            )
+        total += len(batch)
+    return total
+
+
+def create_ids(model, objects, batch_size=BATCH_SIZE):
+    """bulk_create пачками, возвращает только первичные ключи."""
+    ids = []
+    for batch in chunks(objects, batch_size):
+        ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    return ids
+
+
+def generate(
+    users=100,
+    recipes=1000,
+    ingredients_per_recipe=8,
+    subscriptions_per_user=10,
+    favorites_per_user=20,
+    cart_per_user=5,
+    seed=0,
+    prefix="synthetic",
+    exponent=ZIPF_EXPONENT,
+    batch_size=BATCH_SIZE,
+    log=None,
+):
+    """
+    Создает данные пачками. Сигналы не отправляются, поэтому кэш нужно
+    сбросить отдельно, если данные остаются в базе.
+
+    *_per_user - средние значения, ingredients_per_recipe - среднее
+    число ингредиентов в рецепте.
+    """
+    def stage(name):
+        return random.Random(f"{seed}:{name}")
+
+    def report(name, count, started):
+        if log is not None:
+            log(f"{name}: {count} за {time.monotonic() - started:.1f} с")
+
+    data = SyntheticData(tags=ensure_tags(prefix))
+    data.ingredients = ensure_ingredients()
+
+    started = time.monotonic()
+    password = make_password(None)
+    data.user_ids = create_ids(
+        User,
+        (
+            User(
+                username=f"{prefix}{seed}_{index}",
+                email=f"{prefix}{seed}_{index}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+                password=password,
+            )
+            for index in range(users)
+        ),
+        batch_size,
+    )
+    report("Пользователи", len(data.user_ids), started)
+    user_weights = zipf_weights(len(data.user_ids), exponent)
+
+    started = time.monotonic()
+    rng = stage("recipes")
+    data.recipe_ids = create_ids(
+        Recipe,
+        (
+            Recipe(
+                author_id=author_id,
+                name=f"Рецепт {index}",
+                image=IMAGE_NAME,
+                text="Текст рецепта. " * rng.randint(5, 50),
+                cooking_time=rng.randint(1, 180),
+            )
+            for index, author_id in enumerate(
+                rng.choices(
+                    data.user_ids, cum_weights=user_weights, k=recipes
+                )
+            )
+        ),
+        batch_size,
+    )
+    report("Рецепты", len(data.recipe_ids), started)
+    recipe_weights = zipf_weights(len(data.recipe_ids), exponent)
+
+    started = time.monotonic()
+    rng = stage("tags")
+    tag_ids = [tag.id for tag in data.tags]
+    count = insert(
+        Recipe.tags.through,
+        ("recipe", "tag"),
+        (
+            (recipe_id, tag_id)
+            for recipe_id in data.recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, MIN_TAGS))
+        ),
+        batch_size,
+    )
+    report("Теги рецептов", count, started)
+
+    started = time.monotonic()
+    rng = stage("ingredients")
+    ingredient_ids = [ingredient.id for ingredient in data.ingredients]
+    # Порядок популярности ингредиентов не должен совпадать с алфавитом.
+    rng.shuffle(ingredient_ids)
+    ingredient_weights = zipf_weights(len(ingredient_ids), exponent)
+    count = insert(
+        RecipeIngredient,
+        ("recipe", "ingredient", "amount"),
+        (
+            (recipe_id, ingredient_id, rng.randint(1, 500))
+            for recipe_id in data.recipe_ids
+            for ingredient_id in zipf_sample(
+                rng,
+                ingredient_ids,
+                ingredient_weights,
+                max(1, round(rng.gauss(ingredients_per_recipe, 2))),
+            )
+        ),
+        batch_size,
+    )
+    report("Ингредиенты рецептов", count, started)
+
+    started = time.monotonic()
+    rng = stage("subscriptions")
+    count = insert(
+        Subscription,
+        ("user", "subscribed_to"),
+        (
+            (user_id, author_id)
+            for user_id in data.user_ids
+            for author_id in zipf_sample(
+                rng,
+                data.user_ids,
+                user_weights,
+                activity(rng, subscriptions_per_user),
+            )
+            if author_id != user_id
+        ),
+        batch_size,
+    )
+    report("Подписки", count, started)
+
+    for model, per_user in (
+        (Favorite, favorites_per_user),
+        (ShoppingCart, cart_per_user),
+    ):
+        started = time.monotonic()
+        rng = stage(model.__name__)
+        count = insert(
+            model,
+            ("user", "recipe"),
+            (
+                (user_id, recipe_id)
+                for user_id in data.user_ids
+                for recipe_id in zipf_sample(
+                    rng,
+                    data.recipe_ids,
+                    recipe_weights,
+                    activity(rng, per_user),
+                )
+            ),
+            batch_size,
+        )
+        report(model._meta.verbose_name_plural, count, started)
+    return data
+
+
+def ensure_tags(prefix):
+    tags = list(Tag.objects.order_by("id"))
+    if len(tags) < MIN_TAGS:
+        tags += Tag.objects.bulk_create(
+            [
+                Tag(name=f"Тег {index}", slug=f"{prefix}-{index}")
+                for index in range(len(tags), MIN_TAGS)
+            ]
+        )
+    return tags
+
+
+def ensure_ingredients():
+    """Пустой справочник заполняется настоящим из data/ingredients.csv."""
+    if not Ingredient.objects.exists():
+        path = os.path.join(settings.CSV_DIR, "ingredients.csv")
+        with open(path, encoding="utf-8") as file:
+            Ingredient.objects.bulk_create(
+                Ingredient(**row) for row in csv.DictReader(file)
+            )
+    return list(Ingredient.objects.order_by("id"))
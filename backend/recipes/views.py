@@ -1,9 +1,17 @@
+import functools
 import io
 import logging
+import os
 from http import HTTPStatus
 
-from django.db.models import Sum
-from django.http import FileResponse
+from django.conf import settings
+from django.db.models import Exists, Max, OuterRef, Sum
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+)
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filters
 from django_filters.rest_framework import DjangoFilterBackend
@@ -15,6 +23,7 @@ from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
@@ -22,8 +31,19 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 from rest_framework.versioning import AcceptHeaderVersioning
 
-from utils.mixins import APIVersionMixin
+from users.models import Subscription
+from utils.cache import invalidate_tags
+from utils.metrics import PDF_RENDER
+from utils.mixins import (
+    APIVersionMixin,
+    ConditionalGetMixin,
+    RenderedCacheMixin,
+    ThrottleMixin,
+)
+from utils.parsers import FastJSONParser
+from utils.views import cached_json_response
 
+from .builders import recipe_columns
 from .filters import IngredientFilter, RecipeFilter
 from .models import (
     Favorite,
@@ -34,11 +54,15 @@ from .models import (
     ShortLink,
 )
 from .pagination import RecipePagination
+from .parsers import ImageUploadParser
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     FavoriteRecipeSerializer,
     IngredientSerializer,
+    RecipeCardSerializer,
+    RecipeImageSerializer,
     RecipeReadSerializer,
+    RecipeShortSerializer,
     RecipeWriteSerializer,
     ShoppingCartCreateSerializer,
     ShoppingCartSerializer,
@@ -47,10 +71,30 @@ from .utils import generate_short_code
 
 logger = logging.getLogger(__name__)
 
-pdfmetrics.registerFont(TTFont("Arial", "data/arial.ttf"))
+PDF_FONT = "Arial"
 
 
-class RecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
+@functools.cache
+def register_pdf_font():
+    """
+    Регистрирует шрифт для PDF один раз на процесс. Вызывается при
+    первой выгрузке или заранее в мастере gunicorn (см. gunicorn.conf.py):
+    файл читается целиком и не держится открытым, поэтому после fork
+    воркеры используют уже загруженный шрифт.
+    """
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT, os.path.join(settings.CSV_DIR, "arial.ttf"))
+    )
+    return PDF_FONT
+
+
+class RecipeViewSet(
+    ThrottleMixin,
+    ConditionalGetMixin,
+    RenderedCacheMixin,
+    APIVersionMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Recipe.objects.order_by("id")
     serializer_class = RecipeReadSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
@@ -58,18 +102,128 @@ class RecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     versioning_class = AcceptHeaderVersioning
+    parser_classes = [
+        FastJSONParser,
+        MultiPartParser,
+        FormParser,
+        ImageUploadParser,
+    ]
+    # Для чтения (list, retrieve и т.д.) - serializer_class.
+    serializer_classes = {
+        "create": RecipeWriteSerializer,
+        "update": RecipeWriteSerializer,
+        "partial_update": RecipeWriteSerializer,
+        "image": RecipeImageSerializer,
+    }
+    # В списках 2.0 - карточки без ингредиентов и текста.
+    versions = {
+        "2.0": {
+            "list": {
+                "serializer_class": RecipeCardSerializer,
+                "queryset": Recipe.objects.order_by("id").defer("text"),
+            },
+        },
+    }
+    image_upload_field = "image"
+    cache_version_name = "recipes"
+    cache_timeout = settings.RECIPE_CACHE_TIMEOUT
+    # Запись рецепта трогает теги, ингредиенты, файлы и их учет,
+    # замена картинки - еще и удаление старого файла после коммита.
+    query_budgets = {
+        "create": 25,
+        "update": 32,
+        "partial_update": 32,
+        "image": 22,
+        "destroy": 18,
+    }
+    # Разбор и пережатие картинок и сборка PDF нагружают процессор.
+    throttle_scopes = {
+        "create": "recipe_write",
+        "update": "recipe_write",
+        "partial_update": "recipe_write",
+        "image": "image_upload",
+        "download_shopping_cart": "shopping_cart_pdf",
+    }
 
-    def get_serializer_class(self):
-        if self.action in ["create", "update", "partial_update"]:
-            return RecipeWriteSerializer
-        # Для чтения (list, retrieve и т.д.) используем ReadSerializer
-        return RecipeReadSerializer
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        # Только колонки полей, которые запросил клиент (?fields=).
+        fields, _ = self.get_serializer_class().select_fields(self.request)
+        return queryset.only(*recipe_columns(fields))
+
+    def should_cache(self, request):
+        # Анонимам все отдается одинаково, остальным - со своими флагами.
+        return (
+            super().should_cache(request)
+            and not request.user.is_authenticated
+        )
 
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    def get_version_stamp(self, request):
+        if self.should_cache(request):
+            return self.get_cache_version(), None
+        if self.action != "retrieve":
+            return None
+        # Все, от чего зависит ответ: сам рецепт, теги, ингредиенты,
+        # автор и флаги текущего пользователя.
+        queryset = self.filter_lookup(Recipe.objects.all())
+        if queryset is None:
+            return None
+        queryset = queryset.annotate(
+            tags_updated_at=Max("tags__updated_at"),
+            ingredients_updated_at=Max("ingredients__updated_at"),
+        )
+        fields = [
+            "updated_at",
+            "tags_updated_at",
+            "ingredients_updated_at",
+            "author__email",
+            "author__username",
+            "author__first_name",
+            "author__last_name",
+            "author__avatar",
+        ]
+        user = request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(
+                    Favorite.objects.filter(
+                        user=user, recipe=OuterRef("pk")
+                    )
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=OuterRef("pk")
+                    )
+                ),
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, subscribed_to=OuterRef("author")
+                    )
+                ),
+            )
+            fields += [
+                "is_favorited",
+                "is_in_shopping_cart",
+                "is_subscribed",
+            ]
+        stamp = queryset.values(*fields).first()
+        if stamp is None:
+            return None
+        # У данных автора и флагов пользователя нет даты изменения,
+        # поэтому без Last-Modified: одного If-Modified-Since мало.
+        return tuple(stamp.values()), None
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        # Теги и ингредиенты сохраняются после рецепта, bulk_create
+        # сигналов не шлет.
+        invalidate_tags("recipes")
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_tags("recipes")
 
     @action(detail=True, methods=["get"], url_path="get-link")
     def get_link(self, request, pk=None):
@@ -85,6 +239,20 @@ class RecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
         link = f"/s/{short_link.short_code}"
         return Response({"short-link": link}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["put"])
+    def image(self, request, pk=None):
+        # Замена картинки файлом (multipart или тело запроса) без base64.
+        recipe = self.get_object()
+        serializer = self.get_serializer(recipe, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            RecipeShortSerializer(
+                recipe, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_200_OK,
+        )
+
     def _handle_post_request(self, request, pk, model, serializer_class):
         recipe = get_object_or_404(Recipe, id=pk)
         user = request.user
@@ -150,7 +318,7 @@ class RecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
             bottomMargin=18,
         )
         styles = getSampleStyleSheet()
-        styles["Normal"].fontName = "Arial"  # Установка шрифта
+        styles["Normal"].fontName = register_pdf_font()  # Установка шрифта
         elements = []
 
         ingredients = (
@@ -183,14 +351,20 @@ class RecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
                 Paragraph("Список покупок пуст!", styles["Heading1"])
             )
 
-        doc.build(elements)
+        with PDF_RENDER.time():
+            doc.build(elements)
         buffer.seek(0)
         return FileResponse(
             buffer, as_attachment=True, filename="shopping_cart.pdf"
         )
 
 
-class IngredientViewSet(APIVersionMixin, viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ConditionalGetMixin,
+    RenderedCacheMixin,
+    APIVersionMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -198,9 +372,36 @@ class IngredientViewSet(APIVersionMixin, viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
     versioning_class = AcceptHeaderVersioning
+    cache_version_name = "ingredients"
+
+    def get_version_stamp(self, request):
+        return self.get_cache_version(), None
+
+
+async def ingredient_list(request):
+    """
+    Поиск ингредиентов по началу названия без DRF для ASGI-профиля
+    (settings.ASYNC_VIEWS), ответ тот же, что у IngredientViewSet.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(("GET", "HEAD"))
 
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    async def compute():
+        queryset = Ingredient.objects.values("id", "name", "measurement_unit")
+        name = request.GET.get("name")
+        if name:
+            queryset = queryset.filter(name__istartswith=name)
+        return [ingredient async for ingredient in queryset.aiterator()]
+
+    return await cached_json_response(request, "ingredients", compute)
+
+
+async def short_link_redirect(request, short_code):
+    try:
+        link = await ShortLink.objects.aget(short_code=short_code)
+    except ShortLink.DoesNotExist:
+        raise Http404("Ссылка не найдена.")
+    return HttpResponseRedirect(link.long_url)
 
 
 class FavoriteRecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
@@ -208,14 +409,10 @@ class FavoriteRecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
     serializer_class = RecipeReadSerializer
     permission_classes = [IsAuthenticated]
     versioning_class = AcceptHeaderVersioning
-
-    def get_serializer_class(self):
-        if self.action in ("create", "destroy"):
-            return FavoriteRecipeSerializer
-        return super().get_serializer_class()
-
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    serializer_classes = {
+        "create": FavoriteRecipeSerializer,
+        "destroy": FavoriteRecipeSerializer,
+    }
 
     def create(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -234,16 +431,13 @@ class FavoriteRecipeViewSet(APIVersionMixin, viewsets.ModelViewSet):
 
 class ShoppingCartViewSet(APIVersionMixin, viewsets.ModelViewSet):
     queryset = ShoppingCart.objects.all()
+    serializer_class = ShoppingCartCreateSerializer
     permission_classes = [IsAuthenticated]
     versioning_class = AcceptHeaderVersioning
-
-    def get_serializer_class(self):
-        if self.action in ["list", "retrieve"]:
-            return ShoppingCartSerializer
-        return ShoppingCartCreateSerializer
-
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    serializer_classes = {
+        "list": ShoppingCartSerializer,
+        "retrieve": ShoppingCartSerializer,
+    }
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
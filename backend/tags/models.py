@@ -9,6 +9,9 @@ class Tag(models.Model):
         verbose_name="Название"
     )
     slug = models.SlugField(unique=True, verbose_name="Слаг")
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Дата изменения"
+    )
 
     class Meta:
         verbose_name = "Тэг"
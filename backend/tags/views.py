@@ -1,18 +1,44 @@
+from django.http import HttpResponseNotAllowed
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
 from rest_framework.versioning import AcceptHeaderVersioning
 
-from utils.mixins import APIVersionMixin
+from utils.mixins import (
+    APIVersionMixin,
+    ConditionalGetMixin,
+    RenderedCacheMixin,
+)
+from utils.views import cached_json_response
 
 from .models import Tag
 from .serializers import TagViewSerializer
 
 
-class TagViewSet(APIVersionMixin, viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    ConditionalGetMixin,
+    RenderedCacheMixin,
+    APIVersionMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     queryset = Tag.objects.all().order_by("id")
     serializer_class = TagViewSerializer
     permission_classes = [AllowAny]
     versioning_class = AcceptHeaderVersioning
+    cache_version_name = "tags"
 
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    def get_version_stamp(self, request):
+        return self.get_cache_version(), None
+
+
+async def tag_list(request):
+    """
+    Список тегов без DRF для ASGI-профиля (settings.ASYNC_VIEWS).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(("GET", "HEAD"))
+
+    async def compute():
+        queryset = Tag.objects.order_by("id").values("id", "name", "slug")
+        return [tag async for tag in queryset.aiterator()]
+
+    return await cached_json_response(request, "tags", compute)
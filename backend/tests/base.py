@@ -0,0 +1,15 @@
+from django.test import override_settings
+
+LOCMEM = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests",
+    }
+}
+
+# Общий файловый кэш тестам не нужен.
+use_locmem_cache = override_settings(CACHES=LOCMEM)
+
+# Реплики в тестах - другое соединение с базой:
+# данные из транзакции TestCase им не видны.
+use_primary_only = override_settings(DATABASE_REPLICAS=[])
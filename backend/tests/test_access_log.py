@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .base import use_locmem_cache, use_primary_only
+
+ACCESS_LOG_MIDDLEWARE = "utils.middleware.AccessLogMiddleware"
+
+
+@use_locmem_cache
+@use_primary_only
+class AccessLogTests(TestCase):
+    def test_off_by_default(self):
+        self.assertNotIn(ACCESS_LOG_MIDDLEWARE, settings.MIDDLEWARE)
+
+    def test_record_fields(self):
+        with override_settings(
+            MIDDLEWARE=[ACCESS_LOG_MIDDLEWARE, *settings.MIDDLEWARE]
+        ), self.assertLogs("foodgram.access", "INFO") as logs:
+            self.client.get("/api/tags/")
+        record = logs.records[0]
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.view, "tag-list")
+        self.assertEqual(record.action, "list")
+        self.assertEqual(record.queries, 1)
+        for name in ("total_ms", "db_ms", "view_other_ms", "render_ms"):
+            with self.subTest(name=name):
+                self.assertGreaterEqual(getattr(record, name), 0)
+        self.assertLessEqual(
+            record.db_ms + record.view_other_ms + record.render_ms,
+            record.total_ms,
+        )
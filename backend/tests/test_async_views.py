@@ -0,0 +1,55 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from recipes.views import ingredient_list
+from tags.models import Tag
+from tags.views import tag_list
+
+from .base import use_locmem_cache, use_primary_only
+
+JSON = "application/json"
+
+
+@use_locmem_cache
+@use_primary_only
+class AsyncListTests(TestCase):
+    """Async-списки проверяют Accept так же, как представления DRF."""
+
+    views = {"/api/tags/": tag_list, "/api/ingredients/": ingredient_list}
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name="Завтрак", slug="breakfast")
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def get(self, path, accept):
+        request = self.factory.get(path, headers={"Accept": accept})
+        return await self.views[path](request)
+
+    async def test_allowed_versions(self):
+        for path in self.views:
+            for accept in (JSON, f"{JSON}; version=2.0", "*/*"):
+                with self.subTest(path=path, accept=accept):
+                    response = await self.get(path, accept)
+                    self.assertEqual(response.status_code, 200)
+
+    async def test_versions_are_cached_separately(self):
+        first = await self.get("/api/tags/", f"{JSON}; version=1.0")
+        second = await self.get("/api/tags/", f"{JSON}; version=2.0")
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_not_acceptable_like_drf(self):
+        client = APIClient()
+        for path in self.views:
+            for accept in (f"{JSON}; version=3.0", "text/csv"):
+                with self.subTest(path=path, accept=accept):
+                    expected = client.get(path, HTTP_ACCEPT=accept)
+                    response = async_to_sync(self.get)(path, accept)
+                    self.assertEqual(response.status_code, 406)
+                    self.assertEqual(expected.status_code, 406)
+                    self.assertEqual(response.content, expected.content)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.authentication import CachedTokenAuthentication, local_tokens
+from users.models import User
+
+from .base import use_locmem_cache, use_primary_only
+
+ME_URL = "/api/users/me/"
+PASSWORD = "old-secret-password"
+
+
+@use_locmem_cache
+@use_primary_only
+class CachedTokenAuthenticationTests(TestCase):
+    """Кэш токенов не пускает по отозванному токену."""
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.items.clear()
+        self.user = User.objects.create_user(
+            username="auth", email="auth@example.com", password=PASSWORD
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        # Прогреваем оба уровня кэша.
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+    def commit(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    def test_cached_token_skips_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(ME_URL)
+        self.assertFalse(
+            [query for query in queries if "authtoken" in query["sql"]]
+        )
+
+    def test_logout(self):
+        response = self.commit(self.client.post, "/api/auth/token/logout/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_password_change(self):
+        response = self.commit(
+            self.client.post,
+            "/api/users/set_password/",
+            {"current_password": PASSWORD, "new_password": "new-password-1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.commit(self.user.save)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_stale_read_is_not_republished(self):
+        # Чтение базы до коммита блокировки: запрос не должен вернуть
+        # в кэш снимок активного пользователя.
+        cache.clear()
+        local_tokens.items.clear()
+        load_token = CachedTokenAuthentication.load_token
+
+        def load_then_deactivate(auth, key):
+            token = load_token(auth, key)
+            self.user.is_active = False
+            self.commit(self.user.save)
+            return token
+
+        with mock.patch.object(
+            CachedTokenAuthentication, "load_token", load_then_deactivate
+        ):
+            self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_unsafe_methods_skip_cache(self):
+        # QuerySet.update() сигналов не отправляет: кэш остается прежним.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": PASSWORD, "new_password": "new-password-1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 401)
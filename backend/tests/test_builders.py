@@ -0,0 +1,168 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.builders import build_recipes, build_subscriptions
+from recipes.models import Recipe
+from recipes.serializers import (
+    RecipeCardSerializer,
+    RecipeReadSerializer,
+    SubscribeSerializer,
+    serialize_recipes,
+)
+from recipes.synthetic import generate
+from users.builders import USER_FIELDS, User, build_users, user_columns
+from users.serializers import UserSerializer
+from utils.renderers import FastJSONRenderer
+
+from .base import use_locmem_cache
+
+# Частичные ответы (?fields=, ?expand=).
+RECIPE_FIELDSETS = (
+    {},
+    {"fields": "id,name,image,cooking_time"},
+    {"fields": "id,author,tags,ingredients,is_favorited", "expand": "tags"},
+    {"expand": ""},
+)
+USER_FIELDSETS = (
+    {},
+    {"fields": "id,username,is_subscribed,avatar_thumbnails"},
+)
+SUBSCRIPTION_FIELDSETS = (
+    {},
+    {"recipes_limit": "0"},
+    {"recipes_limit": "1"},
+    {"fields": "id,recipes,recipes_count", "expand": ""},
+    {"fields": "id,username,recipes", "recipes_limit": "1"},
+)
+
+
+def make_request(user, **params):
+    request = Request(APIRequestFactory().get("/api/", params))
+    request.user = user
+    request.version = "1.0"
+    return request
+
+
+@use_locmem_cache
+class BuilderTests(TestCase):
+    """
+    Сборщики из .values() отдают те же байты,
+    что и сериализаторы DRF.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(
+            users=8,
+            recipes=40,
+            subscriptions_per_user=3,
+            favorites_per_user=5,
+            cart_per_user=3,
+            prefix="builders",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.renderer = FastJSONRenderer()
+        self.recipes = list(Recipe.objects.order_by("id"))
+        self.users = [AnonymousUser(), *User.objects.order_by("id")]
+
+    def assertSameContent(self, serialized, built):
+        self.assertEqual(
+            self.renderer.render(built), self.renderer.render(serialized)
+        )
+
+    def serialize_users(self, request):
+        return UserSerializer(
+            User.objects.order_by("id"),
+            many=True,
+            context={"request": request},
+        ).data
+
+    def test_recipes(self):
+        for user in self.users:
+            for params in RECIPE_FIELDSETS:
+                with self.subTest(user=user, **params):
+                    request = make_request(user, **params)
+                    self.assertSameContent(
+                        serialize_recipes(
+                            self.recipes, {"request": request}
+                        ),
+                        build_recipes(
+                            self.recipes,
+                            request,
+                            *RecipeReadSerializer.select_fields(request),
+                        ),
+                    )
+
+    def test_recipe_cards(self):
+        for user in self.users:
+            with self.subTest(user=user):
+                request = make_request(user)
+                self.assertSameContent(
+                    serialize_recipes(
+                        self.recipes,
+                        {"request": request},
+                        RecipeCardSerializer,
+                    ),
+                    build_recipes(
+                        self.recipes,
+                        request,
+                        RecipeCardSerializer.Meta.fields,
+                    ),
+                )
+
+    def test_users(self):
+        for user in self.users:
+            for params in USER_FIELDSETS:
+                with self.subTest(user=user, **params):
+                    request = make_request(user, **params)
+                    fields, _ = UserSerializer.select_fields(request)
+                    rows = User.objects.order_by("id").values(
+                        *user_columns(fields)
+                    )
+                    self.assertSameContent(
+                        self.serialize_users(request),
+                        build_users(list(rows), request, fields),
+                    )
+
+    def test_users_without_fields(self):
+        request = make_request(self.users[1])
+        rows = User.objects.order_by("id").values(*USER_FIELDS)
+        self.assertSameContent(
+            self.serialize_users(request), build_users(list(rows), request)
+        )
+
+    def test_subscriptions(self):
+        subscribers = User.objects.filter(
+            users_subscriptions__isnull=False
+        ).distinct()
+        self.assertTrue(subscribers.exists())
+        for user in subscribers:
+            authors = User.objects.filter(
+                users_subscribers__user=user
+            ).order_by("id")
+            for params in SUBSCRIPTION_FIELDSETS:
+                with self.subTest(user=user, **params):
+                    request = make_request(user, **params)
+                    fields, expanded = SubscribeSerializer.select_fields(
+                        request
+                    )
+                    columns = user_columns(
+                        name for name in fields if name != "recipes"
+                    )
+                    rows = authors.annotate(
+                        recipes_count=Count("recipes")
+                    ).values(*columns)
+                    self.assertSameContent(
+                        SubscribeSerializer(
+                            authors, many=True, context={"request": request}
+                        ).data,
+                        build_subscriptions(
+                            list(rows), request, fields, expanded
+                        ),
+                    )
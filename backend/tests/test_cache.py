@@ -0,0 +1,231 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+
+from utils import cache as cache_utils
+from utils.cache import (
+    LOCK_KEY,
+    bump_version,
+    cache_aside,
+    cache_many,
+    cached,
+    get_stats,
+    get_version,
+    invalidate_tags,
+    make_key,
+)
+
+from .base import use_locmem_cache
+
+
+class Compute:
+    """Возвращает номер вызова."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+@use_locmem_cache
+class CacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def stats(self, name):
+        return get_stats().get(name, {"hit": 0, "miss": 0, "early": 0})
+
+
+class CacheAsideTests(CacheTestCase):
+    def test_miss_then_hit(self):
+        compute = Compute()
+        self.assertEqual(cache_aside("aside", (1,), compute), 1)
+        self.assertEqual(cache_aside("aside", (1,), compute), 1)
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(
+            self.stats("aside"), {"hit": 1, "miss": 1, "early": 0}
+        )
+
+    def test_parts_are_part_of_key(self):
+        compute = Compute()
+        cache_aside("parts", (1,), compute)
+        cache_aside("parts", (2,), compute)
+        self.assertEqual(compute.calls, 2)
+
+    def test_store_if_rejects_value(self):
+        compute = Compute()
+        cache_aside("store-if", (), compute, store_if=lambda value: False)
+        cache_aside("store-if", (), compute, store_if=lambda value: False)
+        self.assertEqual(compute.calls, 2)
+
+    def test_lock_released_after_compute_error(self):
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            cache_aside("error", (), fail)
+        key = make_key("error", ())
+        self.assertIsNone(cache.get(LOCK_KEY.format(key)))
+
+    def test_cached_decorator(self):
+        compute = Compute()
+
+        @cached("decorated", tags=lambda pk: (f"item:{pk}",))
+        def load(pk):
+            return compute()
+
+        self.assertEqual(load(1), 1)
+        self.assertEqual(load(1), 1)
+        self.assertEqual(load(2), 2)
+        bump_version("item:1")
+        self.assertEqual(load(1), 3)
+        self.assertEqual(load(2), 2)
+
+
+class VersionTests(CacheTestCase):
+    def test_version_is_stable_until_bumped(self):
+        version = get_version("tag")
+        self.assertEqual(get_version("tag"), version)
+        bump_version("tag")
+        self.assertNotEqual(get_version("tag"), version)
+
+    def test_key_depends_on_tag_versions(self):
+        key = make_key("versioned", (1,), tags=("tag",))
+        self.assertEqual(make_key("versioned", (1,), tags=("tag",)), key)
+        self.assertNotEqual(
+            make_key("versioned", (1,), tags=("other",)), key
+        )
+        bump_version("tag")
+        self.assertNotEqual(make_key("versioned", (1,), tags=("tag",)), key)
+
+    def test_bump_makes_value_unreachable(self):
+        compute = Compute()
+        cache_aside("tagged", (), compute, tags=("a", "b"))
+        bump_version("b")
+        self.assertEqual(
+            cache_aside("tagged", (), compute, tags=("a", "b")), 2
+        )
+
+
+@use_locmem_cache
+class InvalidateTagsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bumps_on_commit(self):
+        version = get_version("tag")
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate_tags("tag")
+            # До коммита версия прежняя.
+            self.assertEqual(get_version("tag"), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version("tag"), version)
+
+    def test_rollback_keeps_version(self):
+        version = get_version("tag")
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    invalidate_tags("tag")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(get_version("tag"), version)
+
+
+class StampedeTests(CacheTestCase):
+    def test_waits_for_value_computed_elsewhere(self):
+        key = make_key("stampede", ())
+        cache.add(LOCK_KEY.format(key), True)
+        compute = Compute()
+
+        def fill():
+            time.sleep(0.1)
+            cache.set(key, ("other", 0.1, None))
+
+        thread = threading.Thread(target=fill)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.assertEqual(cache_aside("stampede", (), compute), "other")
+        self.assertEqual(compute.calls, 0)
+        self.assertEqual(self.stats("stampede")["hit"], 1)
+
+    @mock.patch.object(cache_utils, "LOCK_TIMEOUT", 0.1)
+    def test_computes_when_lock_holder_is_gone(self):
+        key = make_key("abandoned", ())
+        cache.add(LOCK_KEY.format(key), True)
+        compute = Compute()
+        self.assertEqual(cache_aside("abandoned", (), compute), 1)
+        self.assertEqual(self.stats("abandoned")["miss"], 1)
+
+    def test_early_recompute(self):
+        key = make_key("early", ())
+        # Долгий расчет, срок скоро истечет.
+        cache.set(key, ("old", 1e6, time.time() + 1))
+        compute = Compute()
+        self.assertEqual(cache_aside("early", (), compute), 1)
+        self.assertEqual(self.stats("early")["early"], 1)
+        self.assertEqual(cache.get(key)[0], 1)
+
+    def test_early_recompute_done_by_lock_holder_only(self):
+        key = make_key("early-locked", ())
+        cache.set(key, ("old", 1e6, time.time() + 1))
+        cache.add(LOCK_KEY.format(key), True)
+        compute = Compute()
+        self.assertEqual(cache_aside("early-locked", (), compute), "old")
+        self.assertEqual(compute.calls, 0)
+
+    def test_no_early_recompute_without_beta(self):
+        key = make_key("fresh", ())
+        cache.set(key, ("old", 1e6, time.time() + 1))
+        compute = Compute()
+        self.assertEqual(cache_aside("fresh", (), compute, beta=0), "old")
+
+
+class CacheManyTests(CacheTestCase):
+    def test_computes_only_missing(self):
+        batches = []
+
+        def compute_many(items):
+            batches.append(items)
+            return [item * 10 for item in items]
+
+        def get_parts(item):
+            return (item,)
+
+        self.assertEqual(
+            cache_many("many", [1, 2], get_parts, compute_many), [10, 20]
+        )
+        self.assertEqual(
+            cache_many("many", [2, 3, 1], get_parts, compute_many),
+            [20, 30, 10],
+        )
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertEqual(
+            self.stats("many"), {"hit": 2, "miss": 3, "early": 0}
+        )
+
+    def test_tags_invalidate_all_items(self):
+        compute = Compute()
+
+        def compute_many(items):
+            return [compute() for _ in items]
+
+        def load():
+            return cache_many(
+                "many-tags", [1, 2], lambda item: (item,), compute_many,
+                tags=("tag",),
+            )
+
+        self.assertEqual(load(), [1, 2])
+        self.assertEqual(load(), [1, 2])
+        bump_version("tag")
+        self.assertEqual(load(), [3, 4])
@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+from recipes.synthetic import generate
+from users.models import User
+
+from .base import use_locmem_cache, use_primary_only
+
+# Дата в будущем: по одному If-Modified-Since ответ был бы 304.
+FUTURE = http_date(4102444800)
+
+
+@use_locmem_cache
+@use_primary_only
+class RecipeConditionalGetTests(TestCase):
+    """ETag рецепта учитывает все, от чего зависит ответ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(
+            users=3,
+            recipes=3,
+            subscriptions_per_user=0,
+            favorites_per_user=0,
+            cart_per_user=0,
+            prefix="conditional",
+        )
+        cls.recipe = Recipe.objects.order_by("id").first()
+        cls.users = list(User.objects.order_by("id")[:2])
+        cls.tokens = [Token.objects.create(user=user) for user in cls.users]
+
+    def setUp(self):
+        cache.clear()
+        self.url = f"/api/recipes/{self.recipe.id}/"
+        self.clients = []
+        for token in self.tokens:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+            self.clients.append(client)
+
+    def get(self, client=None, **headers):
+        return (client or self.clients[0]).get(self.url, **headers)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_anonymous_etag(self):
+        client = APIClient()
+        etag = self.get(client)["ETag"]
+        response = self.get(client, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tag_change_changes_etag(self):
+        etag = self.get()["ETag"]
+        tag = self.recipe.tags.first()
+        tag.name = "Новое имя"
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_user_flags(self):
+        first, second = (self.get(client)["ETag"] for client in self.clients)
+        Favorite.objects.create(user=self.users[0], recipe=self.recipe)
+        response = self.get(HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_favorited"])
+        # У другого пользователя флаги прежние.
+        response = self.get(self.clients[1], HTTP_IF_NONE_MATCH=second)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_alone_is_not_enough(self):
+        response = self.get()
+        self.assertNotIn("Last-Modified", response)
+        Favorite.objects.create(user=self.users[0], recipe=self.recipe)
+        response = self.get(HTTP_IF_MODIFIED_SINCE=FUTURE)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["is_favorited"])
+
+    def test_response_varies_by_authorization(self):
+        response = self.get()
+        self.assertIn("Authorization", response["Vary"])
+        self.assertIn("private", response["Cache-Control"])
@@ -0,0 +1,102 @@
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from recipes.models import Recipe
+from utils import db
+from utils.db import ReplicaRouter, use_primary
+from utils.middleware import ReplicaRoutingMiddleware
+
+from .base import use_locmem_cache
+
+router = ReplicaRouter()
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_outside_request_reads_primary(self):
+        self.assertIsNone(router.db_for_read(Recipe))
+
+    def test_reads_chosen_replica(self):
+        token = db.start("replica1")
+        try:
+            self.assertEqual(router.db_for_read(Recipe), "replica1")
+        finally:
+            db.finish(token)
+
+    def test_reads_own_writes_from_primary(self):
+        token = db.start("replica1")
+        try:
+            self.assertEqual(router.db_for_write(Recipe), "default")
+            self.assertTrue(db.wrote())
+            self.assertIsNone(router.db_for_read(Recipe))
+        finally:
+            db.finish(token)
+        self.assertFalse(db.wrote())
+
+    def test_use_primary(self):
+        token = db.start("replica1")
+        try:
+            with use_primary():
+                self.assertIsNone(router.db_for_read(Recipe))
+            self.assertEqual(router.db_for_read(Recipe), "replica1")
+        finally:
+            db.finish(token)
+
+    def test_relations_between_copies_allowed(self):
+        recipe, other = Recipe(), Recipe()
+        recipe._state.db, other._state.db = "default", "replica1"
+        self.assertTrue(router.allow_relation(recipe, other))
+
+
+@use_locmem_cache
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.reads = []
+        self.write = False
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+
+    def view(self, request):
+        if self.write:
+            router.db_for_write(Recipe)
+        self.reads.append(router.db_for_read(Recipe))
+        return HttpResponse()
+
+    def request(self, method, token="first"):
+        request = getattr(self.factory, method)(
+            "/api/recipes/", HTTP_AUTHORIZATION=f"Token {token}"
+        )
+        self.middleware(request)
+        return self.reads[-1]
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.request("get"), "replica1")
+        self.assertEqual(self.request("get"), "replica1")
+
+    def test_write_pins_client_to_primary(self):
+        self.assertIsNone(self.request("post"))
+        self.assertIsNone(self.request("get"))
+        # Другие клиенты читают с реплики.
+        self.assertEqual(self.request("get", token="second"), "replica1")
+
+    def test_write_in_safe_request_pins_client(self):
+        self.write = True
+        self.assertIsNone(self.request("get"))
+        self.write = False
+        self.assertIsNone(self.request("get"))
+
+    @override_settings(DATABASE_REPLICA_PIN_SECONDS=0.05)
+    def test_pin_expires(self):
+        self.request("post")
+        self.assertIsNone(self.request("get"))
+        time.sleep(0.1)
+        self.assertEqual(self.request("get"), "replica1")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertIsNone(self.request("get"))
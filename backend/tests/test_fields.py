@@ -0,0 +1,49 @@
+import base64
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+
+from recipes import fields
+from recipes.fields import Base64ImageField
+from utils.testing import png
+
+PREFIX = "data:image/png;base64,"
+
+
+def wrap(text, width):
+    return "\r\n".join(
+        text[index:index + width] for index in range(0, len(text), width)
+    )
+
+
+class Base64ImageFieldDecodeTests(SimpleTestCase):
+    def setUp(self):
+        self.content = png(128)
+        self.encoded = base64.b64encode(self.content).decode()
+
+    def decode(self, text):
+        file = Base64ImageField().decode(PREFIX + text)
+        self.addCleanup(file.close)
+        return file.read()
+
+    def test_plain(self):
+        self.assertEqual(self.decode(self.encoded), self.content)
+
+    @mock.patch.object(fields, "BASE64_CHUNK_SIZE", 10)
+    def test_line_breaks_across_chunks(self):
+        # Куски по 10 символов режут группы base64 посередине.
+        for width in (76, 7, 1):
+            with self.subTest(width=width):
+                self.assertEqual(
+                    self.decode(wrap(self.encoded, width)), self.content
+                )
+
+    @mock.patch.object(fields, "BASE64_CHUNK_SIZE", 10)
+    def test_truncated(self):
+        with self.assertRaises(ValidationError):
+            self.decode(self.encoded[:-1])
+
+    def test_not_an_image(self):
+        with self.assertRaises(ValidationError):
+            self.decode(base64.b64encode(b"text" * 10).decode())
@@ -0,0 +1,141 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from recipes.images import process_image, thumbnail_names
+from recipes.models import MediaFile, Recipe
+from users.models import User
+from utils.testing import png
+
+ORIENTATION = 0x0112
+
+
+def image_options(**options):
+    return override_settings(
+        IMAGE_PROCESSING={**settings.IMAGE_PROCESSING, **options}
+    )
+
+
+def jpeg(size, orientation=None):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    Image.new("RGB", size, (10, 200, 10)).save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def open_result(content):
+    result = process_image(ContentFile(content))
+    return result.name, Image.open(io.BytesIO(result.read()))
+
+
+@image_options(MAX_SIZE=64, FORMAT="WEBP")
+class ProcessImageTests(SimpleTestCase):
+    def test_exif_orientation_is_applied_and_dropped(self):
+        # Ориентация 6: снимок нужно повернуть на 90 градусов.
+        _, image = open_result(jpeg((40, 20), orientation=6))
+        self.assertEqual(image.size, (20, 40))
+        self.assertNotIn(ORIENTATION, image.getexif())
+
+    def test_large_image_is_reduced(self):
+        _, image = open_result(jpeg((200, 100)))
+        self.assertEqual(image.size, (64, 32))
+
+    def test_small_image_is_not_enlarged(self):
+        _, image = open_result(png(32))
+        self.assertEqual(image.size, (32, 32))
+
+    def test_webp_output(self):
+        name, image = open_result(png(32))
+        self.assertTrue(name.endswith(".webp"))
+        self.assertEqual(image.format, "WEBP")
+
+    @image_options(MAX_SIZE=64, FORMAT="JPEG")
+    def test_jpeg_output(self):
+        name, image = open_result(png(32))
+        self.assertTrue(name.endswith(".jpg"))
+        self.assertEqual(image.format, "JPEG")
+
+    def test_not_an_image(self):
+        with self.assertRaises(ValidationError):
+            process_image(ContentFile(b"<svg></svg>"))
+
+    def test_too_small(self):
+        with self.assertRaises(ValidationError):
+            process_image(ContentFile(png(8)))
+
+
+class MediaFileReferenceTests(TestCase):
+    """Файл удаляется после коммита, когда на него нет ссылок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="media", email="media@example.com"
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def create_recipe(self, content):
+        recipe = Recipe(
+            author=self.author, name="Рецепт", text="Текст", cooking_time=5
+        )
+        recipe.image = process_image(ContentFile(content))
+        recipe.save()
+        return recipe
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).references
+
+    def assertFilesExist(self, name, exist=True):
+        for file_name in (name, *thumbnail_names(name)):
+            self.assertEqual(default_storage.exists(file_name), exist)
+
+    def test_same_content_is_shared(self):
+        first = self.create_recipe(png(32))
+        second = self.create_recipe(png(32))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertFilesExist(first.image.name)
+
+    def test_delete_releases_reference(self):
+        first = self.create_recipe(png(32))
+        second = self.create_recipe(png(32))
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertFilesExist(name)
+        with self.captureOnCommitCallbacks() as callbacks:
+            second.delete()
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+        # До коммита файл на месте: откат вернет учетную запись.
+        self.assertFilesExist(name)
+        for callback in callbacks:
+            callback()
+        self.assertFilesExist(name, False)
+
+    def test_replace_releases_old_file(self):
+        recipe = self.create_recipe(png(32))
+        old_name = recipe.image.name
+        recipe.image = process_image(ContentFile(png(48)))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertNotEqual(recipe.image.name, old_name)
+        self.assertEqual(self.references(recipe.image.name), 1)
+        self.assertFalse(MediaFile.objects.filter(name=old_name).exists())
+        self.assertFilesExist(old_name, False)
+        self.assertFilesExist(recipe.image.name)
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from .base import use_locmem_cache
+
+LABELS = {
+    "view": "TagViewSet",
+    "action": "list",
+    "method": "GET",
+    "status": "200",
+}
+
+
+def sample(name, labels=LABELS):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@use_locmem_cache
+@override_settings(METRICS_DIR=None)
+class MetricsTests(TestCase):
+    """Запрос к API попадает в /metrics."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_request_is_counted(self):
+        before = sample("http_request_duration_seconds_count")
+        self.assertEqual(self.client.get("/api/tags/").status_code, 200)
+        self.assertEqual(
+            sample("http_request_duration_seconds_count"), before + 1
+        )
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        content = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_bucket{action="list",'
+            'le="0.005",method="GET",status="200",view="TagViewSet"}',
+            content,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{action="list",'
+            'method="GET",status="200",view="TagViewSet"}',
+            content,
+        )
+        self.assertIn(
+            'db_queries_total{action="list",view="TagViewSet"}', content
+        )
+
+    def test_unmatched_path(self):
+        labels = {
+            "view": "unmatched",
+            "action": "",
+            "method": "GET",
+            "status": "404",
+        }
+        before = sample("http_request_duration_seconds_count", labels)
+        with self.assertLogs("django.request", "WARNING"):
+            self.client.get("/no-such-page/")
+        self.assertEqual(
+            sample("http_request_duration_seconds_count", labels), before + 1
+        )
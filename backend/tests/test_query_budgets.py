@@ -0,0 +1,266 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.synthetic import generate
+from users.models import Subscription, User
+from utils.testing import (
+    QueryBudgetMixin,
+    get_path_budget,
+    png,
+    png_data_url,
+)
+
+from .base import use_locmem_cache, use_primary_only
+
+PASSWORD = "Budget-check-123"
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@use_locmem_cache
+@use_primary_only
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THROTTLE_ENABLED=False)
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """
+    Действия укладываются в query_budgets своего
+    ViewSet на холодном кэше и без N+1.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        data = generate(
+            users=10,
+            recipes=30,
+            subscriptions_per_user=4,
+            favorites_per_user=6,
+            cart_per_user=4,
+            prefix="budget",
+        )
+        cls.recipe = Recipe.objects.get(id=data.recipe_ids[0])
+        cls.user = cls.recipe.author
+        cls.user.set_password(PASSWORD)
+        cls.user.save()
+        cls.author = (
+            User.objects.exclude(id=cls.user.id).order_by("id").first()
+        )
+        cls.tag = data.tags[0]
+        cls.ingredient = data.ingredients[0]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.anon = APIClient()
+        self.auth = APIClient()
+        self.auth.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.recipe_url = f"/api/recipes/{self.recipe.id}/"
+
+    def recipe_data(self, image_size=64):
+        return {
+            "name": "Проверка бюджета",
+            "text": "Текст",
+            "cooking_time": 5,
+            "tags": [self.tag.id],
+            "ingredients": [{"id": self.ingredient.id, "amount": 3}],
+            "image": png_data_url(image_size),
+        }
+
+    def assertRequestWithinBudget(
+        self, client, method, path, data=None, expected=status.HTTP_200_OK
+    ):
+        kwargs = {}
+        if isinstance(data, bytes):
+            kwargs = {"data": data, "content_type": "image/png"}
+        elif data is not None:
+            kwargs = {"data": data, "format": "json"}
+        with self.assertQueryBudget(get_path_budget(method, path)):
+            response = getattr(client, method)(path, **kwargs)
+        self.assertEqual(response.status_code, expected)
+        return response
+
+
+class RecipeQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        self.assertRequestWithinBudget(self.anon, "get", "/api/recipes/")
+        self.assertRequestWithinBudget(self.auth, "get", "/api/recipes/")
+        self.assertRequestWithinBudget(
+            self.auth,
+            "get",
+            f"/api/recipes/?is_favorited=1&tags={self.tag.slug}",
+        )
+
+    def test_retrieve(self):
+        self.assertRequestWithinBudget(self.anon, "get", self.recipe_url)
+        self.assertRequestWithinBudget(self.auth, "get", self.recipe_url)
+
+    def test_get_link(self):
+        self.assertRequestWithinBudget(
+            self.auth, "get", f"{self.recipe_url}get-link/"
+        )
+
+    def test_download_shopping_cart(self):
+        ShoppingCart.objects.get_or_create(
+            user=self.user, recipe=self.recipe
+        )
+        self.assertRequestWithinBudget(
+            self.auth, "get", "/api/recipes/download_shopping_cart/"
+        )
+
+    def test_create(self):
+        self.assertRequestWithinBudget(
+            self.auth,
+            "post",
+            "/api/recipes/",
+            self.recipe_data(),
+            status.HTTP_201_CREATED,
+        )
+
+    def test_partial_update(self):
+        # Вторая загрузка освобождает файл.
+        for size in (64, 32):
+            self.assertRequestWithinBudget(
+                self.auth, "patch", self.recipe_url, self.recipe_data(size)
+            )
+
+    def test_image(self):
+        for size in (64, 32):
+            self.assertRequestWithinBudget(
+                self.auth, "put", f"{self.recipe_url}image/", png(size)
+            )
+
+    def test_destroy(self):
+        # Учтенный файл удаляется с рецептом.
+        self.auth.put(
+            f"{self.recipe_url}image/", png(), content_type="image/png"
+        )
+        self.assertRequestWithinBudget(
+            self.auth,
+            "delete",
+            self.recipe_url,
+            expected=status.HTTP_204_NO_CONTENT,
+        )
+
+    def test_favorite(self):
+        Favorite.objects.filter(user=self.user, recipe=self.recipe).delete()
+        url = f"{self.recipe_url}favorite/"
+        self.assertRequestWithinBudget(
+            self.auth, "post", url, expected=status.HTTP_201_CREATED
+        )
+        self.assertRequestWithinBudget(
+            self.auth, "delete", url, expected=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_shopping_cart(self):
+        ShoppingCart.objects.filter(
+            user=self.user, recipe=self.recipe
+        ).delete()
+        url = f"{self.recipe_url}shopping_cart/"
+        self.assertRequestWithinBudget(
+            self.auth, "post", url, expected=status.HTTP_201_CREATED
+        )
+        self.assertRequestWithinBudget(
+            self.auth, "delete", url, expected=status.HTTP_204_NO_CONTENT
+        )
+
+
+class ReferenceQueryBudgetTests(QueryBudgetTestCase):
+    def test_tags(self):
+        self.assertRequestWithinBudget(self.anon, "get", "/api/tags/")
+        self.assertRequestWithinBudget(
+            self.anon, "get", f"/api/tags/{self.tag.id}/"
+        )
+
+    def test_ingredients(self):
+        self.assertRequestWithinBudget(
+            self.anon, "get", "/api/ingredients/?name=а"
+        )
+        self.assertRequestWithinBudget(
+            self.anon, "get", f"/api/ingredients/{self.ingredient.id}/"
+        )
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        self.assertRequestWithinBudget(self.anon, "get", "/api/users/")
+        self.assertRequestWithinBudget(self.auth, "get", "/api/users/")
+
+    def test_retrieve(self):
+        self.assertRequestWithinBudget(
+            self.auth, "get", f"/api/users/{self.author.id}/"
+        )
+
+    def test_me(self):
+        self.assertRequestWithinBudget(self.auth, "get", "/api/users/me/")
+
+    def test_subscriptions(self):
+        Subscription.objects.get_or_create(
+            user=self.user, subscribed_to=self.author
+        )
+        self.assertRequestWithinBudget(
+            self.auth, "get", "/api/users/subscriptions/?recipes_limit=2"
+        )
+
+    def test_subscribe(self):
+        Subscription.objects.filter(
+            user=self.user, subscribed_to=self.author
+        ).delete()
+        url = f"/api/users/{self.author.id}/subscribe/"
+        self.assertRequestWithinBudget(
+            self.auth, "post", url, expected=status.HTTP_201_CREATED
+        )
+        self.assertRequestWithinBudget(
+            self.auth, "delete", url, expected=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_avatar(self):
+        # Вторая загрузка освобождает файл.
+        for size in (64, 32):
+            self.assertRequestWithinBudget(
+                self.auth,
+                "put",
+                "/api/users/me/avatar/",
+                {"avatar": png_data_url(size)},
+            )
+        self.assertRequestWithinBudget(
+            self.auth,
+            "delete",
+            "/api/users/me/avatar/",
+            expected=status.HTTP_204_NO_CONTENT,
+        )
+
+    def test_set_password(self):
+        self.assertRequestWithinBudget(
+            self.auth,
+            "post",
+            "/api/users/set_password/",
+            {
+                "current_password": PASSWORD,
+                "new_password": f"{PASSWORD}-new",
+            },
+            status.HTTP_204_NO_CONTENT,
+        )
+
+    def test_create(self):
+        self.assertRequestWithinBudget(
+            self.anon,
+            "post",
+            "/api/users/",
+            {
+                "username": "budget-check",
+                "email": "budget-check@example.com",
+                "password": PASSWORD,
+                "first_name": "Бюджет",
+                "last_name": "Проверка",
+            },
+            status.HTTP_201_CREATED,
+        )
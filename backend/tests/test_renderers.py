@@ -0,0 +1,95 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from utils import parsers, renderers
+from utils.parsers import FastJSONParser
+from utils.renderers import FastJSONRenderer
+
+MOSCOW = datetime.timezone(datetime.timedelta(hours=3))
+
+DATA = {
+    "decimal": Decimal("12.50"),
+    "utc": datetime.datetime(
+        2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+    ),
+    "moscow": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=MOSCOW),
+    "naive": datetime.datetime(2024, 5, 1, 12, 30),
+    "date": datetime.date(2024, 5, 1),
+    "time": datetime.time(7, 5, 1, 500),
+    "lazy": gettext_lazy("Имя"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "text": "Борщ   со сметаной   😋",
+    "numbers": [1, 2.5, -0.0, 10**20, True, None],
+    "nested": {"1": [], "пусто": {}},
+}
+
+
+class RendererParityTests(SimpleTestCase):
+    """FastJSONRenderer отдает те же байты, что JSONRenderer DRF."""
+
+    def assertSameOutput(self, data, media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_types(self):
+        for key, value in DATA.items():
+            with self.subTest(key=key):
+                self.assertSameOutput({key: value})
+
+    def test_list(self):
+        self.assertSameOutput([DATA, DATA])
+
+    def test_none(self):
+        self.assertSameOutput(None)
+
+    def test_indent(self):
+        self.assertSameOutput(DATA, "application/json; indent=4")
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertSameOutput(DATA)
+
+
+class ParserParityTests(SimpleTestCase):
+    def parse(self, parser, content, encoding="utf-8"):
+        return parser.parse(
+            io.BytesIO(content), parser_context={"encoding": encoding}
+        )
+
+    def assertSameResult(self, content, encoding="utf-8"):
+        self.assertEqual(
+            self.parse(FastJSONParser(), content, encoding),
+            self.parse(JSONParser(), content, encoding),
+        )
+
+    def test_round_trip(self):
+        self.assertSameResult(FastJSONRenderer().render(DATA))
+
+    def test_non_utf8_encoding(self):
+        self.assertSameResult(
+            '{"name": "Crème brûlée"}'.encode("latin-1"), "latin-1"
+        )
+
+    def test_invalid_json(self):
+        for content in (b"{", b'{"value": NaN}', b"\xff"):
+            for parser in (FastJSONParser(), JSONParser()):
+                with self.subTest(content=content, parser=parser):
+                    with self.assertRaises(ParseError):
+                        self.parse(parser, content)
+
+    def test_without_orjson(self):
+        with mock.patch.object(parsers, "orjson", None):
+            self.assertSameResult(FastJSONRenderer().render(DATA))
+            with self.assertRaises(ParseError):
+                self.parse(FastJSONParser(), b'{"value": NaN}')
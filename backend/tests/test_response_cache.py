@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.synthetic import generate
+from utils.cache import bump_version
+
+from .base import use_locmem_cache, use_primary_only
+
+RECIPES_URL = "/api/recipes/"
+
+
+@use_locmem_cache
+@use_primary_only
+class RecipeResponseCacheTests(TestCase):
+    """Кэш готовых ответов со списком рецептов для анонимов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(
+            users=3,
+            recipes=6,
+            subscriptions_per_user=0,
+            favorites_per_user=0,
+            cart_per_user=0,
+            prefix="response",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, params, **extra):
+        response = self.client.get(RECIPES_URL, params, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_request_is_served_from_cache(self):
+        expected = self.get({"limit": 2})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get({"limit": 2}), expected)
+
+    def test_unknown_params_do_not_leak_into_links(self):
+        self.get({"limit": 2, "evil": "http://x"})
+        data = self.get({"limit": 2})
+        self.assertEqual(
+            data["next"], "http://testserver/api/recipes/?limit=2&page=2"
+        )
+
+    def test_params_outside_filters_are_part_of_key(self):
+        self.get({"limit": 2, "name": "a"})
+        data = self.get({"limit": 2, "name": "b"})
+        self.assertIn("name=b", data["next"])
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "other.test"])
+    def test_host_is_part_of_key(self):
+        self.get({"limit": 2})
+        data = self.get({"limit": 2}, HTTP_HOST="other.test")
+        self.assertTrue(data["next"].startswith("http://other.test/"))
+        self.assertTrue(
+            data["results"][0]["image"].startswith("http://other.test/")
+        )
+
+    def test_version_bump_refreshes_response(self):
+        self.get({"limit": 2})
+        Recipe.objects.filter(
+            id=Recipe.objects.order_by("id").values("id")[:1]
+        ).update(name="Новое имя", updated_at=timezone.now())
+        bump_version("recipes")
+        data = self.get({"limit": 2})
+        self.assertEqual(data["results"][0]["name"], "Новое имя")
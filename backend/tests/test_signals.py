@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.synthetic import generate
+from users.models import User
+from utils.cache import get_version
+
+from .base import use_locmem_cache
+
+
+@use_locmem_cache
+class AuthorChangedTests(TestCase):
+    """Кэш рецептов сбрасывают только видимые в них поля автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate(
+            users=2,
+            recipes=4,
+            subscriptions_per_user=0,
+            favorites_per_user=0,
+            cart_per_user=0,
+            prefix="signals",
+        )
+        cls.author = User.objects.filter(recipes__isnull=False).first()
+
+    def setUp(self):
+        cache.clear()
+        self.version = get_version("recipes")
+
+    def save(self, user, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(**kwargs)
+
+    def assertInvalidated(self, invalidated=True):
+        if invalidated:
+            self.assertNotEqual(get_version("recipes"), self.version)
+        else:
+            self.assertEqual(get_version("recipes"), self.version)
+
+    def test_signup(self):
+        self.save(User(username="new", email="new@example.com"))
+        self.assertInvalidated(False)
+
+    def test_password_change(self):
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password("secret-password")
+        self.save(author)
+        self.assertInvalidated(False)
+
+    def test_author_name_change(self):
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Другое"
+        self.save(author, update_fields=["first_name"])
+        self.assertInvalidated()
+
+    def test_update_fields_without_changes(self):
+        author = User.objects.get(pk=self.author.pk)
+        author.last_name = "Другая"
+        self.save(author, update_fields=["first_name"])
+        self.assertInvalidated(False)
+
+    def test_user_without_recipes(self):
+        user = User.objects.create(username="reader", email="r@example.com")
+        user = User.objects.get(pk=user.pk)
+        user.first_name = "Читатель"
+        self.save(user)
+        self.assertInvalidated(False)
@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from users.models import User
+from utils.checks import check_throttle_cache
+from utils.throttling import SlidingWindowThrottle, get_semaphore
+
+from .base import LOCMEM, use_locmem_cache, use_primary_only
+
+CART_URL = "/api/recipes/download_shopping_cart/"
+
+
+def make_throttle(now):
+    throttle = SlidingWindowThrottle()
+    throttle.timer = lambda: now
+    return throttle
+
+
+@use_locmem_cache
+@override_settings(THROTTLE_RATES={"test": "10/min"})
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        request = Request(APIRequestFactory().get("/", REMOTE_ADDR="1.2.3.4"))
+        request.user = SimpleNamespace(is_authenticated=False)
+        self.request = request
+        self.view = SimpleNamespace(
+            throttle_scopes={"list": "test"}, action="list"
+        )
+
+    def allow(self, now):
+        throttle = make_throttle(now)
+        return throttle.allow_request(self.request, self.view), throttle
+
+    def test_previous_window_is_weighted(self):
+        # Предыдущее окно исчерпано, прошла половина текущего: его вес 0.5.
+        for _ in range(10):
+            self.assertTrue(self.allow(30)[0])
+        results = [self.allow(90)[0] for _ in range(6)]
+        self.assertEqual(results, [True] * 5 + [False])
+
+    def test_rejected_request_does_not_use_limit(self):
+        for _ in range(10):
+            self.allow(0)
+        for _ in range(3):
+            self.assertFalse(self.allow(0)[0])
+        # Через окно вес предыдущего - 0.5, доступно 5 запросов.
+        results = [self.allow(90)[0] for _ in range(6)]
+        self.assertEqual(results, [True] * 5 + [False])
+
+    def test_headers(self):
+        _, throttle = self.allow(15)
+        self.assertEqual(
+            self.request.rate_limit,
+            {
+                "RateLimit-Limit": 10,
+                "RateLimit-Remaining": 9,
+                "RateLimit-Reset": 45,
+            },
+        )
+        self.assertEqual(throttle.wait(), 45)
+
+    def test_unknown_scope_is_not_limited(self):
+        self.view.action = "retrieve"
+        for _ in range(20):
+            self.assertTrue(self.allow(0)[0])
+
+
+@use_locmem_cache
+@use_primary_only
+@override_settings(
+    THROTTLE_RATES={"shopping_cart_pdf": "2/min"},
+    CONCURRENCY_LIMITS={"shopping_cart_pdf": 1},
+)
+class ThrottleMixinTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username="throttle", email="throttle@example.com"
+        )
+        cls.token = Token.objects.create(user=user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_rate_limit_headers_and_rejection(self):
+        for remaining in (1, 0):
+            response = self.client.get(CART_URL)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["RateLimit-Limit"], "2")
+            self.assertEqual(response["RateLimit-Remaining"], str(remaining))
+        response = self.client.get(CART_URL)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_concurrency_limit(self):
+        semaphore = get_semaphore("shopping_cart_pdf")
+        self.assertTrue(semaphore.acquire(blocking=False))
+        try:
+            response = self.client.get(CART_URL)
+        finally:
+            semaphore.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        # Семафор свободен: отклоненный запрос его не держит.
+        self.assertEqual(self.client.get(CART_URL).status_code, 200)
+
+
+class ThrottleCacheCheckTests(SimpleTestCase):
+    def test_file_cache_is_not_atomic(self):
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": (
+                        "django.core.cache.backends.filebased."
+                        "FileBasedCache"
+                    ),
+                    "LOCATION": "/tmp/throttle-check",
+                }
+            }
+        ):
+            ids = [error.id for error in check_throttle_cache(None)]
+        self.assertEqual(ids, ["foodgram.W001"])
+
+    def test_local_cache_is_per_process(self):
+        with override_settings(CACHES=LOCMEM):
+            ids = [error.id for error in check_throttle_cache(None)]
+        self.assertEqual(ids, ["foodgram.W002"])
+
+    def test_disabled_throttle(self):
+        with override_settings(CACHES=LOCMEM, THROTTLE_ENABLED=False):
+            self.assertEqual(check_throttle_cache(None), [])
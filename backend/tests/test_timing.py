@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from utils import timing
+
+from .base import use_locmem_cache, use_primary_only
+
+
+def timed(middleware):
+    # Так же, как settings при MIDDLEWARE_TIMING.
+    return [
+        "utils.middleware.ServerTimingMiddleware",
+        *(
+            path
+            for name in middleware
+            for path in (f"utils.timing.{name.rsplit('.', 1)[1]}", name)
+        ),
+        "utils.timing.View",
+    ]
+
+
+@use_locmem_cache
+@use_primary_only
+class ServerTimingTests(TestCase):
+    def test_markers_for_every_middleware(self):
+        for path in settings.MIDDLEWARE:
+            name = path.rsplit(".", 1)[1]
+            with self.subTest(name=name):
+                marker = getattr(timing, name)
+                self.assertTrue(issubclass(marker, timing.TimingMarker))
+                self.assertEqual(marker.label, name.lower())
+
+    def test_header_lists_every_layer(self):
+        with override_settings(MIDDLEWARE=timed(settings.MIDDLEWARE)):
+            response = self.client.get("/api/tags/")
+        self.assertEqual(response.status_code, 200)
+        labels = [
+            metric.split(";", 1)[0]
+            for metric in response["Server-Timing"].split(", ")
+        ]
+        expected = [
+            path.rsplit(".", 1)[1].lower() for path in settings.MIDDLEWARE
+        ]
+        for label in (*expected, "view", "total"):
+            with self.subTest(label=label):
+                self.assertIn(label, labels)
@@ -0,0 +1,141 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import permissions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from utils.cache import invalidate_tags, make_key
+from utils.db import use_primary
+
+TOKEN_KEY = "auth-token"
+
+
+class LocalCache:
+    """Ограниченный LRU-кэш процесса с коротким сроком жизни записей."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        # Число удалений: set(..., deletions) не сохраняет значение,
+        # прочитанное до удаления.
+        self.deletions = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, deletions=None):
+        with self.lock:
+            if deletions is not None and deletions != self.deletions:
+                return
+            self.items[key] = (value, time.monotonic() + self.timeout)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+            self.deletions += 1
+
+
+local_tokens = LocalCache(
+    settings.AUTH_TOKEN_LOCAL_SIZE, settings.AUTH_TOKEN_LOCAL_TIMEOUT
+)
+
+
+def token_digest(key):
+    # Сам токен в имена ключей кэша не попадает.
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def token_tag(digest):
+    return f"{TOKEN_KEY}:{digest}"
+
+
+def invalidate_token(key):
+    digest = token_digest(key)
+    # Ключ общего кэша зависит от версии тега: запрос, который прочитал
+    # базу до коммита, запишет старые данные под старым ключом.
+    invalidate_tags(token_tag(digest))
+    transaction.on_commit(lambda: local_tokens.delete(digest))
+
+
+def invalidate_user_tokens(user):
+    for key in Token.objects.filter(user=user).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе для чтения: токен вместе с
+    пользователем хранится в LRU процесса и в общем кэше. Другие
+    процессы могут видеть старые данные не дольше
+    AUTH_TOKEN_LOCAL_TIMEOUT секунд, поэтому запросы на изменение
+    всегда читают пользователя из основной базы.
+
+    Кэш сбрасывают сигналы users.signals. QuerySet.update() сигналов
+    не отправляет: после массового изменения пользователей (например,
+    is_active) нужно вызвать invalidate_user_tokens для каждого.
+    """
+
+    def authenticate(self, request):
+        self.use_cache = request.method in permissions.SAFE_METHODS
+        return super().authenticate(request)
+
+    def load_token(self, key):
+        with use_primary():
+            token = (
+                self.get_model()
+                .objects.select_related("user")
+                .filter(key=key)
+                .first()
+            )
+        if token is None:
+            raise AuthenticationFailed(_("Invalid token."))
+        return token
+
+    def get_cached_token(self, key):
+        digest = token_digest(key)
+        # Храним байты, чтобы запросы не делили один объект пользователя.
+        data = local_tokens.get(digest)
+        if data is None:
+            # Снимок, прочитанный до сброса, в LRU не попадет.
+            deletions = local_tokens.deletions
+            cache_key = make_key(
+                TOKEN_KEY, (digest,), tags=(token_tag(digest),)
+            )
+            data = cache.get(cache_key)
+            if data is None:
+                data = pickle.dumps(self.load_token(key))
+                cache.set(cache_key, data, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            local_tokens.set(digest, data, deletions)
+        return pickle.loads(data)
+
+    def authenticate_credentials(self, key):
+        if getattr(self, "use_cache", True):
+            token = self.get_cached_token(key)
+        else:
+            token = self.load_token(key)
+        if not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        return token.user, token
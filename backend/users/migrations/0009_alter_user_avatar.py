@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-19 07:15
+
+from django.db import migrations
+
+import recipes.images
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_alter_subscription_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="avatar",
+            field=recipes.images.ThumbnailImageField(
+                blank=True,
+                default="avatars/default_avatar.png",
+                null=True,
+                upload_to="avatars/",
+                verbose_name="Аватар",
+            ),
+        ),
+    ]
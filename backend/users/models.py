@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from recipes.images import ThumbnailImageField
+
 from .constants import MAX_LENGHT_FIRST, MAX_LENGHT_NAME
 
 
@@ -14,7 +16,7 @@ class User(AbstractUser):
         max_length=MAX_LENGHT_FIRST,
         verbose_name="Фамилия",
     )
-    avatar = models.ImageField(
+    avatar = ThumbnailImageField(
         upload_to="avatars/",
         default="avatars/default_avatar.png",
         null=True,
@@ -1,17 +1,29 @@
 # users/serializers.py
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
-from recipes.fields import Base64ImageField
+from recipes.fields import Base64ImageField, ThumbnailsField
+from utils.fieldsets import SparseFieldsetMixin
 
 from .models import Subscription
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def lock_user(user):
+    """
+    Свежая строка пользователя из основной базы под блокировкой:
+    request.user может быть снимком из кэша аутентификации, его
+    сохранение вернуло бы старые пароль и аватар.
+    """
+    return User.objects.select_for_update().get(pk=user.pk)
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar_thumbnails = ThumbnailsField(source="avatar")
 
     class Meta:
         model = User
@@ -23,10 +35,15 @@ class UserSerializer(serializers.ModelSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_thumbnails",
         )
         read_only_fields = ("email",)
 
     def get_is_subscribed(self, obj):
+        # Подписки могут быть загружены заранее одним запросом на страницу.
+        subscriptions = self.context.get("subscriptions")
+        if subscriptions is not None:
+            return obj.id in subscriptions
         request = self.context.get("request")
         if request and hasattr(request, "user"):
             return (
@@ -70,6 +87,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 class UserDetailSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar_thumbnails = ThumbnailsField(source="avatar")
 
     class Meta:
         model = User
@@ -81,6 +99,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_thumbnails",
         )
 
     def get_is_subscribed(self, obj):
@@ -115,11 +134,12 @@ class SetPasswordSerializer(serializers.Serializer):
             )
         return data
 
+    @transaction.atomic
     def save(self):
-        user = self.context["request"].user
+        user = lock_user(self.context["request"].user)
         new_password = self.validated_data["new_password"]
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=["password"])
 
 
 class AvatarSerializer(serializers.Serializer):
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Выход (djoser удаляет токен) и удаление пользователя.
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Смена пароля, блокировка и правка профиля: в кэше лежит снимок
+    # пользователя. Вход обновляет только last_login. QuerySet.update()
+    # сюда не попадает, см. CachedTokenAuthentication.
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_user_tokens(instance)
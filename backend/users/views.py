@@ -1,9 +1,13 @@
 
 from django.contrib.auth import get_user_model
-from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
+from djoser.conf import settings as djoser_settings
+from djoser.utils import logout_user
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -12,9 +16,13 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 from rest_framework.versioning import AcceptHeaderVersioning
 
+from recipes.builders import build_subscriptions
+from recipes.parsers import ImageUploadParser
 from recipes.serializers import SubscribeSerializer
-from utils.mixins import APIVersionMixin
+from utils.mixins import APIVersionMixin, ThrottleMixin
+from utils.parsers import FastJSONParser
 
+from .builders import build_users, user_columns
 from .models import Subscription
 from .pagination import UserPagination
 from .permissions import IsAuthenticatedUser, IsOwnerOrReadOnly
@@ -24,36 +32,51 @@ from .serializers import (
     UserDetailSerializer,
     UserRegistrationSerializer,
     UserSerializer,
+    lock_user,
 )
 
 User = get_user_model()
 
 
-class UserViewSet(APIVersionMixin, viewsets.ModelViewSet):
+class UserViewSet(ThrottleMixin, APIVersionMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = UserPagination
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
     permission_classes = [IsAuthenticatedUser]
     versioning_class = AcceptHeaderVersioning
-
-    def get_serializer_class(self):
-        if self.action == "list":
-            return UserSerializer
-        if self.action == "retrieve":
-            return UserDetailSerializer
-        if self.action == "create":
-            return UserRegistrationSerializer
-        if self.action == "set_password":
-            return SetPasswordSerializer
-        if self.action in ["avatar"]:
-            return UserDetailSerializer
-        if self.action == "subscribe":
-            return SubscribeSerializer
-        return UserSerializer
-
-    def get(self, request, *args, **kwargs):
-        return self.get_versioned_response(request)
+    parser_classes = [
+        FastJSONParser,
+        MultiPartParser,
+        FormParser,
+        ImageUploadParser,
+    ]
+    serializer_classes = {
+        "retrieve": UserDetailSerializer,
+        "create": UserRegistrationSerializer,
+        "set_password": SetPasswordSerializer,
+        "avatar": UserDetailSerializer,
+        "subscribe": SubscribeSerializer,
+    }
+    image_upload_field = "avatar"
+    # Аватар: блокировка пользователя, учет файлов и удаление старого.
+    query_budgets = {"avatar": 24}
+    # Хэширование пароля при регистрации и обработка аватара дорогие.
+    throttle_scopes = {"create": "registration", "avatar": "image_upload"}
+
+    def list(self, request, *args, **kwargs):
+        # Список собирается из .values() в обход полей сериализатора,
+        # читаются только колонки запрошенных полей (?fields=).
+        fields, _ = self.get_serializer_class().select_fields(request)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *user_columns(fields)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(build_users(list(queryset), request, fields))
+        return self.get_paginated_response(
+            build_users(page, request, fields)
+        )
 
     def get_permissions(self):
         if self.action in ["create", "get"]:
@@ -98,6 +121,8 @@ class UserViewSet(APIVersionMixin, viewsets.ModelViewSet):
         )
         if serializer.is_valid():
             serializer.save()
+            if djoser_settings.LOGOUT_ON_PASSWORD_CHANGE:
+                logout_user(request)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -110,27 +135,33 @@ class UserViewSet(APIVersionMixin, viewsets.ModelViewSet):
         url_path="me/avatar",
     )
     def avatar(self, request, *args, **kwargs):
-        user = request.user
-
         if request.method in ["PUT", "PATCH"]:
             serializer = AvatarSerializer(data=request.data)
             if serializer.is_valid():
                 avatar = serializer.validated_data["avatar"]
-                user.avatar = avatar
-                user.save()
+                with transaction.atomic():
+                    user = lock_user(request.user)
+                    user.avatar = avatar
+                    user.save(update_fields=["avatar"])
                 return Response(
-                    {"avatar": user.avatar.url}, status=status.HTTP_200_OK
+                    {
+                        "avatar": user.avatar.url,
+                        "avatar_thumbnails": user.avatar.thumbnails,
+                    },
+                    status=status.HTTP_200_OK,
                 )
             return Response(
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
         if request.method == "DELETE":
-            if user.avatar:
-                if default_storage.exists(user.avatar.name):
-                    default_storage.delete(user.avatar.name)
-                user.avatar = ""
-                user.save()
+            with transaction.atomic():
+                user = lock_user(request.user)
+                if user.avatar:
+                    # Файл удалится, если на него больше никто не
+                    # ссылается.
+                    user.avatar = ""
+                    user.save(update_fields=["avatar"])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -194,9 +225,15 @@ class UserViewSet(APIVersionMixin, viewsets.ModelViewSet):
     )
     def subscriptions(self, request, *args, **kwargs):
         user = request.user
+        fields, expanded = SubscribeSerializer.select_fields(request)
         queryset = User.objects.filter(users_subscribers__user=user)
+        if "recipes_count" in fields:
+            queryset = queryset.annotate(recipes_count=Count("recipes"))
+        # Рецепты читаются отдельно по id автора.
+        queryset = queryset.values(
+            *user_columns(name for name in fields if name != "recipes")
+        )
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(
-            pages, many=True, context={"request": request}
+        return self.get_paginated_response(
+            build_subscriptions(pages, request, fields, expanded)
         )
-        return self.get_paginated_response(serializer.data)
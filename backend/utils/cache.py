@@ -0,0 +1,224 @@
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from .db import use_primary
+from .metrics import CACHE_REQUESTS
+
+VERSION_KEY = "version:{}"
+LOCK_KEY = "lock:{}"
+# Сколько ждать, пока значение считает другой процесс, и как часто
+# проверять, не появилось ли оно.
+LOCK_TIMEOUT = 5
+LOCK_POLL_INTERVAL = 0.05
+# Коэффициент раннего пересчета (XFetch): чем больше, тем раньше.
+EARLY_EXPIRY_BETA = 1.0
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name, event, amount=1):
+    if not amount:
+        return
+    with _stats_lock:
+        _stats[name, event] += amount
+    CACHE_REQUESTS.labels(cache=name, result=event).inc(amount)
+
+
+def get_stats():
+    """
+    Счетчики попаданий в кэш текущего процесса:
+    {имя: {"hit": ..., "miss": ..., "early": ...}}.
+    """
+    with _stats_lock:
+        items = list(_stats.items())
+    stats = {}
+    for (name, event), value in items:
+        stats.setdefault(name, {"hit": 0, "miss": 0, "early": 0})
+        stats[name][event] = value
+    return stats
+
+
+def get_version(name):
+    return get_versions((name,))[0]
+
+
+def get_versions(names):
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(name):
+    # Случайное значение вместо incr: версия не повторится, даже если
+    # ключ вытеснили из кэша, а параллельные изменения не теряются.
+    cache.set(VERSION_KEY.format(name), uuid.uuid4().hex, None)
+
+
+def invalidate_tags(*tags):
+    # До коммита другие воркеры еще видят старые данные и могли бы
+    # сохранить их в кэш уже под новой версией.
+    for tag in tags:
+        transaction.on_commit(lambda tag=tag: bump_version(tag))
+
+
+def make_key(name, parts, tags=()):
+    """
+    Ключ зависит от версий тегов: сброс тега делает старые ключи
+    недостижимыми, и они просто вытесняются по таймауту.
+    """
+    return _make_key(name, get_versions(tags) if tags else (), parts)
+
+
+def _make_key(name, versions, parts):
+    source = repr((versions, parts))
+    return f"{name}:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def _expired_early(delta, expires_at, beta):
+    if expires_at is None:
+        return False
+    # 1 - random() лежит в (0, 1], логарифм всегда определен.
+    return (
+        time.time() - delta * beta * math.log(1 - random.random())
+        >= expires_at
+    )
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cache_aside(
+    name,
+    parts,
+    compute,
+    timeout=DEFAULT_TIMEOUT,
+    tags=(),
+    store_if=None,
+    beta=EARLY_EXPIRY_BETA,
+):
+    """
+    Возвращает значение из кэша или считает его через compute().
+
+    Защита от лавины запросов: при промахе считает один процесс,
+    остальные ждут его результата; незадолго до истечения срока
+    значение заранее пересчитывает один случайный запрос.
+
+    Блокировка - cache.add(), она надежна только в Redis и Memcached.
+    В FileBasedCache add() - проверка и запись без блокировки, и
+    изредка значение посчитают несколько процессов: результат тот же,
+    теряется только экономия. В LocMemCache блокировка своя у каждого
+    процесса.
+    """
+    key = make_key(name, parts, tags)
+    lock_key = LOCK_KEY.format(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        # Пересчитывает тот, кто взял блокировку, остальным хватит
+        # еще не истекшего значения.
+        if (
+            not _expired_early(delta, expires_at, beta)
+            or not cache.add(lock_key, True, LOCK_TIMEOUT)
+        ):
+            _count(name, "hit")
+            return value
+        _count(name, "early")
+        locked = True
+    else:
+        locked = cache.add(lock_key, True, LOCK_TIMEOUT)
+        if not locked:
+            entry = _wait_for(key)
+            if entry is not None:
+                _count(name, "hit")
+                return entry[0]
+        _count(name, "miss")
+
+    try:
+        started = time.monotonic()
+        # Реплика может отставать, а кэш общий и живет долго.
+        with use_primary():
+            value = compute()
+        delta = time.monotonic() - started
+        if store_if is None or store_if(value):
+            if timeout is DEFAULT_TIMEOUT:
+                timeout = cache.default_timeout
+            expires_at = None if timeout is None else time.time() + timeout
+            cache.set(key, (value, delta, expires_at), timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+def cached(name, timeout=DEFAULT_TIMEOUT, tags=()):
+    """
+    Декоратор cache-aside. Аргументы функции входят в ключ через repr,
+    поэтому передавать стоит id и строки, а не объекты моделей.
+
+    tags - имена тегов или функция, получающая аргументы вызова
+    и возвращающая их. Сброс: invalidate_tags(*tags).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            call_tags = tags(*args, **kwargs) if callable(tags) else tags
+            return cache_aside(
+                name,
+                (args, sorted(kwargs.items())),
+                lambda: func(*args, **kwargs),
+                timeout=timeout,
+                tags=call_tags,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def cache_many(
+    name, items, get_parts, compute_many, timeout=DEFAULT_TIMEOUT, tags=()
+):
+    """
+    Пакетный cache-aside: все значения читаются одним get_many,
+    а недостающие считает один вызов compute_many(список объектов).
+    Защиты от лавины нет - рассчитано на дешевые фрагменты.
+    """
+    versions = get_versions(tags) if tags else ()
+    keys = [_make_key(name, versions, get_parts(item)) for item in items]
+    found = cache.get_many(keys)
+    missing = [
+        (key, item) for key, item in zip(keys, items) if key not in found
+    ]
+    _count(name, "hit", len(keys) - len(missing))
+    _count(name, "miss", len(missing))
+    if missing:
+        with use_primary():
+            values = compute_many([item for _, item in missing])
+        computed = {key: value for (key, _), value in zip(missing, values)}
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = cache.default_timeout
+        cache.set_many(computed, timeout)
+        found.update(computed)
+    return [found[key] for key in keys]
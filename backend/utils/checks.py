@@ -0,0 +1,40 @@
+"""Проверки настроек для manage.py check."""
+from django.conf import settings
+from django.core.checks import Warning
+
+# Бэкенды кэша, где add/incr/decr атомарны и общие для всех процессов.
+SHARED_ATOMIC_CACHES = frozenset((
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+))
+# Атомарен, но у каждого процесса свой.
+PROCESS_CACHES = frozenset((
+    "django.core.cache.backends.locmem.LocMemCache",
+))
+
+
+def check_throttle_cache(app_configs, **kwargs):
+    """Счетчикам SlidingWindowThrottle нужен атомарный общий кэш."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if not settings.THROTTLE_ENABLED or backend in SHARED_ATOMIC_CACHES:
+        return []
+    if backend in PROCESS_CACHES:
+        return [
+            Warning(
+                "Счетчики лимитов частоты свои у каждого процесса.",
+                hint=(
+                    "Клиент получит лимит на каждый воркер; для общего "
+                    "лимита нужен CACHE_BACKEND=redis."
+                ),
+                id="foodgram.W002",
+            )
+        ]
+    return [
+        Warning(
+            f"{backend} не меняет счетчики атомарно: параллельные "
+            "запросы могут пройти сверх лимита частоты.",
+            hint="Для лимитов частоты нужен CACHE_BACKEND=redis.",
+            id="foodgram.W001",
+        )
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_KEY = "primary-pin:{}"
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+class RoutingState:
+    def __init__(self, replica=None):
+        # None - читать с основной базы.
+        self.replica = replica
+        self.wrote = False
+
+
+def start(replica):
+    return _state.set(RoutingState(replica))
+
+
+def finish(token):
+    _state.reset(token)
+
+
+def wrote():
+    state = _state.get()
+    return state is not None and state.wrote
+
+
+@contextmanager
+def use_primary():
+    """
+    Чтения внутри блока идут в основную базу: например, при заполнении
+    общего кэша, куда не должны попасть отстающие данные реплики.
+    """
+    token = _state.set(RoutingState())
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def choose_replica():
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+def client_key(request):
+    # Токен или сессия определяют пользователя без запроса к базе.
+    identity = (
+        request.META.get("HTTP_AUTHORIZATION")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get("REMOTE_ADDR", "")
+    )
+    return PIN_KEY.format(hashlib.md5(identity.encode()).hexdigest())
+
+
+def is_pinned(request):
+    return cache.get(client_key(request)) is not None
+
+
+def pin(request):
+    cache.set(
+        client_key(request), True, settings.DATABASE_REPLICA_PIN_SECONDS
+    )
+
+
+class ReplicaRouter:
+    """
+    Чтения безопасных запросов идут на реплику, выбранную для запроса,
+    запись и все остальное - в основную базу. Вне запросов (команды,
+    shell) реплики не используются.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # До конца запроса читаем свои изменения с основной базы.
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
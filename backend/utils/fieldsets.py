@@ -0,0 +1,82 @@
+"""
+Частичные ответы для чтения: ?fields=id,name оставляет только
+перечисленные поля, ?expand=author,tags - какие связи встраивать
+объектами, остальные отдаются идентификаторами. Без параметров ответ
+полный, как раньше.
+"""
+from functools import cached_property
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def parse_names(request, param, available):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",")} - {""}
+    unknown = names - set(available)
+    if unknown:
+        raise ValidationError(
+            {param: f"Неизвестные поля: {', '.join(sorted(unknown))}."}
+        )
+    return names
+
+
+def select_fields(request, available, expandable=()):
+    """
+    Поля ответа в порядке available и множество раскрытых связей.
+    """
+    expandable = frozenset(expandable)
+    if request is None or request.method not in SAFE_METHODS:
+        return tuple(available), expandable
+    requested = parse_names(request, FIELDS_PARAM, available)
+    expand = parse_names(request, EXPAND_PARAM, expandable)
+    if requested is not None:
+        available = [name for name in available if name in requested]
+    if expand is not None:
+        expandable = frozenset(expand)
+    return tuple(available), expandable
+
+
+class SparseFieldsetMixin:
+    """
+    Частичный ответ сериализатора верхнего уровня (и элементов списка).
+    Нераскрытые связи из expandable_fields заменяет get_collapsed_field.
+    """
+    expandable_fields = ()
+
+    @classmethod
+    def select_fields(cls, request):
+        return select_fields(
+            request, cls.Meta.fields, cls.expandable_fields
+        )
+
+    @cached_property
+    def fieldset(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        # Вложенным сериализаторам параметры запроса не относятся.
+        if parent is not None:
+            return tuple(self.Meta.fields), frozenset(self.expandable_fields)
+        return self.select_fields(self.context.get("request"))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names, expanded = self.fieldset
+        return {
+            name: (
+                self.get_collapsed_field(name)
+                if name in self.expandable_fields and name not in expanded
+                else fields[name]
+            )
+            for name in names
+        }
+
+    def get_collapsed_field(self, name):
+        return serializers.PrimaryKeyRelatedField(read_only=True)
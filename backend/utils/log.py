@@ -0,0 +1,131 @@
+"""
+Структурированные логи: JSON-формат и обработчик, который пишет
+в отдельном потоке, чтобы медленный stdout не задерживал запросы.
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# Длительности этапов текущего запроса, см. AccessLogMiddleware.
+_timings = ContextVar("request_timings", default=None)
+
+# Атрибуты LogRecord, которые не надо выводить как поля.
+RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime"}
+
+
+def start_timings():
+    return _timings.set({})
+
+
+def finish_timings(token):
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к этапу name текущего запроса."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (
+            timings.get(name, 0.0) + time.perf_counter() - started
+        )
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись; поля из extra выводятся как есть."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RECORD_ATTRS
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundStreamHandler(QueueHandler):
+    """
+    Форматирует запись в вызывающем потоке и кладет в очередь, а
+    пишет в поток вывода QueueListener. Когда очередь переполнена,
+    записи отбрасываются, а не блокируют запрос.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        self.stream = stream or sys.stderr
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.pid = None
+        self.listener = None
+        self.listener_lock = threading.Lock()
+        super().__init__(queue.Queue(maxsize))
+        atexit.register(self.stop)
+        # Блокировка, захваченная другим потоком в момент fork,
+        # в дочернем процессе не освободится.
+        os.register_at_fork(after_in_child=self.reset_lock)
+
+    def reset_lock(self):
+        self.listener_lock = threading.Lock()
+
+    def start(self):
+        # Поток слушателя не переживает fork, поэтому в каждом
+        # процессе (воркере gunicorn) он запускается заново
+        # при первой записи.
+        with self.listener_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self.dropped = 0
+            target = logging.StreamHandler(self.stream)
+            self.listener = QueueListener(self.queue, target)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def stop(self):
+        with self.listener_lock:
+            if self.listener is None or self.pid != os.getpid():
+                return
+            self.listener.stop()
+            self.listener = None
+        if self.dropped:
+            self.stream.write(
+                f"Очередь логов переполнялась, "
+                f"отброшено записей: {self.dropped}\n"
+            )
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.listener_lock:
+                self.dropped += 1
@@ -0,0 +1,64 @@
+"""
+Метрики Prometheus (prometheus_client).
+
+Под gunicorn воркеры пишут значения в общий каталог
+PROMETHEUS_MULTIPROC_DIR (его создает gunicorn.conf.py), а /metrics
+складывает файлы всех процессов. Без каталога каждый процесс отдает
+только свои значения.
+"""
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса",
+    ("view", "action", "method", "status"),
+)
+DB_QUERIES = Counter(
+    "db_queries_total", "Число SQL-запросов", ("view", "action")
+)
+DB_DURATION = Counter(
+    "db_query_duration_seconds_total",
+    "Суммарное время SQL-запросов",
+    ("view", "action"),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Обращения к кэшу: hit, miss и early (ранний пересчет)",
+    ("cache", "result"),
+)
+PDF_RENDER = Histogram(
+    "pdf_render_duration_seconds", "Сборка PDF со списком покупок"
+)
+IMAGE_PROCESSING = Histogram(
+    "image_processing_duration_seconds",
+    "Декодирование, уменьшение и перекодирование загруженной картинки",
+)
+
+
+def view_labels(view_func, method):
+    """Имя представления и действие ViewSet для меток."""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__name__}", ""
+    actions = getattr(view_func, "actions", None) or {}
+    return view_class.__name__, actions.get(method.lower(), "")
+
+
+def render():
+    if not settings.METRICS_DIR:
+        return generate_latest(REGISTRY)
+    # Значения всех воркеров, включая завершенные.
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, settings.METRICS_DIR)
+    return generate_latest(registry)
@@ -0,0 +1,280 @@
+import hmac
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+
+from . import db, log, metrics, profiling
+from .queries import QueryBudgetExceeded, QueryCounter, get_query_budget
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("foodgram.access")
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет чтения безопасных запросов на реплики. После записи клиент
+    какое-то время читает с основной базы, чтобы видеть свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        replica = (
+            db.choose_replica() if safe and not db.is_pinned(request)
+            else None
+        )
+        token = db.start(replica)
+        try:
+            response = self.get_response(request)
+            if not safe or db.wrote():
+                db.pin(request)
+        finally:
+            db.finish(token)
+        return response
+
+
+class NonAPIMiddlewareMixin:
+    """
+    Пропускает middleware Django для запросов к API: API аутентифицируется
+    токеном, сессии и сообщения ему не нужны.
+    """
+
+    def __call__(self, request):
+        if request.path_info.startswith(settings.API_PREFIX):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class NonAPISessionMiddleware(NonAPIMiddlewareMixin, SessionMiddleware):
+    pass
+
+
+class NonAPIAuthenticationMiddleware(
+    NonAPIMiddlewareMixin, AuthenticationMiddleware
+):
+    pass
+
+
+class NonAPIMessageMiddleware(NonAPIMiddlewareMixin, MessageMiddleware):
+    pass
+
+
+class ServerTimingMiddleware:
+    """
+    Отдает в заголовке Server-Timing время каждого middleware и
+    представления. Метки между слоями расставляет settings.MIDDLEWARE
+    при MIDDLEWARE_TIMING (см. utils.timing).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.timings = []
+        started = time.perf_counter()
+        response = self.get_response(request)
+        total = time.perf_counter() - started
+        # Метки записываются изнутри наружу и меряют слой вместе со всем,
+        # что под ним; собственное время - разность с вложенным слоем.
+        timings = request.timings[::-1]
+        metrics = []
+        for index, (label, duration) in enumerate(timings):
+            if index + 1 < len(timings):
+                duration -= timings[index + 1][1]
+            metrics.append(f"{label};dur={duration * 1000:.3f}")
+        metrics.append(f"total;dur={total * 1000:.3f}")
+        add_server_timing(response, *metrics)
+        return response
+
+
+def add_server_timing(response, *metrics):
+    if response.has_header("Server-Timing"):
+        metrics = (response["Server-Timing"], *metrics)
+    response["Server-Timing"] = ", ".join(metrics)
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы запроса и сообщает, если их больше бюджета
+    представления или один и тот же запрос повторяется (N+1).
+    QUERY_BUDGET_MODE: log - предупреждение в лог, raise - исключение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        add_server_timing(
+            response,
+            f'db;dur={counter.duration * 1000:.3f};desc="{counter.count}"',
+        )
+        problems = counter.problems(request.query_budget)
+        if problems:
+            message = (
+                f"{request.method} {request.path}: " + "; ".join(problems)
+            )
+            if settings.QUERY_BUDGET_MODE == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
+
+
+class MetricsMiddleware:
+    """
+    Время ответа по представлениям и действиям, число и время
+    SQL-запросов для /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_labels = ("unmatched", "")
+        started = time.perf_counter()
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+        view, action = request.metrics_labels
+        metrics.REQUEST_DURATION.labels(
+            view=view,
+            action=action,
+            method=request.method,
+            status=response.status_code,
+        ).observe(time.perf_counter() - started)
+        metrics.DB_QUERIES.labels(view=view, action=action).inc(
+            queries.count
+        )
+        metrics.DB_DURATION.labels(view=view, action=action).inc(
+            queries.duration
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_labels = metrics.view_labels(
+            view_func, request.method
+        )
+
+
+class AccessLogMiddleware:
+    """
+    Одна JSON-строка на запрос: маршрут, действие, пользователь, статус,
+    размер ответа и время по этапам. view_other - время представления
+    без SQL-запросов и рендеринга: аутентификация, проверка прав,
+    сериализация, хеширование паролей и прочая работа Python.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = log.start_timings()
+        request.view_started = None
+        started = time.perf_counter()
+        try:
+            with QueryCounter() as queries:
+                request.queries = queries
+                response = self.get_response(request)
+        finally:
+            timings = log.finish_timings(token)
+        total = time.perf_counter() - started
+        view_other = None
+        if request.view_started is not None:
+            view_started, db_before_view = request.view_started
+            view_other = max(
+                0.0,
+                time.perf_counter()
+                - view_started
+                - timings.get("render", 0.0)
+                - (queries.duration - db_before_view),
+            )
+        match = request.resolver_match
+        user = getattr(request, "user", None)
+        access_logger.info(
+            "%s %s %s",
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "route": match.route if match else None,
+                "view": match.view_name if match else None,
+                "action": getattr(request, "view_action", None),
+                "user_id": (
+                    user.pk if user is not None and user.is_authenticated
+                    else None
+                ),
+                "status": response.status_code,
+                "size": (
+                    None if response.streaming else len(response.content)
+                ),
+                "queries": queries.count,
+                "total_ms": round(total * 1000, 3),
+                "db_ms": round(queries.duration * 1000, 3),
+                "view_other_ms": (
+                    None if view_other is None
+                    else round(view_other * 1000, 3)
+                ),
+                "render_ms": round(timings.get("render", 0.0) * 1000, 3),
+            },
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_started = (
+            time.perf_counter(), request.queries.duration
+        )
+        actions = getattr(view_func, "actions", None) or {}
+        request.view_action = actions.get(request.method.lower())
+
+
+class ProfilerMiddleware:
+    """
+    Профилирует долю PROFILER_SAMPLE_RATE запросов и запросы с
+    заголовком X-Profile: <PROFILER_TOKEN>. Стеки сохраняются в
+    PROFILER_DIR, имя файла возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler_class = profiling.SAMPLERS[settings.PROFILER_MODE]
+
+    def should_profile(self, request):
+        token = request.headers.get("X-Profile")
+        if token and settings.PROFILER_TOKEN:
+            return hmac.compare_digest(token, settings.PROFILER_TOKEN)
+        return random.random() < settings.PROFILER_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        sampler = self.sampler_class(settings.PROFILER_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        if stacks:
+            name = profiling.file_name(
+                request.method, request.path, time.perf_counter() - started
+            )
+            profiling.save(settings.PROFILER_DIR, name, stacks)
+            response["X-Profile-Id"] = name
+        return response
@@ -1,12 +1,267 @@
-from rest_framework.response import Response
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+
+from .cache import cache_aside, get_version
+from .throttling import get_semaphore, get_throttle_scope
 
 
 class APIVersionMixin:
-    def get_versioned_response(self, request):
-        version = request.version
-        version_data = {
-            "1.0": {"version": "1.0", "message": "This is version 1.0"},
-            "2.0": {"version": "2.0", "message": "This is version 2.0"}
+    """
+    Сериализатор и queryset по действию и версии API (request.version).
+    serializer_classes задает сериализаторы действий для всех версий,
+    versions - отличия версий:
+
+        versions = {
+            "2.0": {"list": {"serializer_class": ..., "queryset": ...}},
+        }
+
+    Таблица собирается один раз при создании класса, в запросе остается
+    два поиска по словарю.
+    """
+    serializer_classes = {}
+    versions = {}
+    version_options = ("serializer_class", "queryset")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        base = {
+            action: {"serializer_class": serializer_class}
+            for action, serializer_class in cls.serializer_classes.items()
         }
-        data = version_data.get(version, {"error": "Unsupported version"})
-        return Response(data)
+        cls.version_table = {None: base}
+        for version, actions in cls.versions.items():
+            if version not in api_settings.ALLOWED_VERSIONS:
+                raise ImproperlyConfigured(
+                    f"{cls.__name__}: неизвестная версия API {version}."
+                )
+            table = dict(base)
+            for action, options in actions.items():
+                unknown = set(options) - set(cls.version_options)
+                if unknown:
+                    raise ImproperlyConfigured(
+                        f"{cls.__name__}: неизвестные параметры версии "
+                        f"{version}: {', '.join(sorted(unknown))}."
+                    )
+                table[action] = {**base.get(action, {}), **options}
+            cls.version_table[version] = table
+
+    def get_version_options(self):
+        table = self.version_table.get(
+            getattr(self.request, "version", None), self.version_table[None]
+        )
+        return table.get(self.action, {})
+
+    def get_serializer_class(self):
+        serializer_class = self.get_version_options().get("serializer_class")
+        if serializer_class is None:
+            return super().get_serializer_class()
+        return serializer_class
+
+    def get_queryset(self):
+        queryset = self.get_version_options().get("queryset")
+        if queryset is None:
+            return super().get_queryset()
+        # Как GenericAPIView: не переиспользуем кэш результатов.
+        return queryset.all()
+
+
+class ThrottleMixin:
+    """
+    Ограничения для действий из throttle_scopes: частоту проверяет
+    SlidingWindowThrottle, а здесь - число одновременно выполняемых
+    действий и заголовки RateLimit-* в ответе.
+    """
+    # Действие ViewSet -> область лимитов, см. THROTTLE_RATES.
+    throttle_scopes = {}
+    concurrency_retry_after = 1
+
+    def dispatch(self, request, *args, **kwargs):
+        self.held_semaphore = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # finalize_response не вызывается, если обработчик упал с
+            # исключением не из DRF: семафор отпускаем здесь.
+            if self.held_semaphore is not None:
+                self.held_semaphore.release()
+                self.held_semaphore = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        semaphore = get_semaphore(get_throttle_scope(self))
+        if semaphore is None:
+            return
+        # Не ждем: поток воркера нужнее легким запросам.
+        if not semaphore.acquire(blocking=False):
+            raise Throttled(
+                wait=self.concurrency_retry_after,
+                detail="Слишком много одновременных запросов.",
+            )
+        self.held_semaphore = semaphore
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        for header, value in getattr(request, "rate_limit", {}).items():
+            response[header] = str(value)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Отдает ETag/Last-Modified и отвечает 304 без сериализации,
+    если у клиента актуальная копия. get_version_stamp возвращает данные
+    для ETag и дату для Last-Modified; дата отдается, только если ее
+    изменение покрывает все эти данные, иначе - None.
+    """
+
+    def get_version_stamp(self, request):
+        # По умолчанию версия - число объектов и дата последнего изменения.
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            queryset = self.filter_lookup(queryset)
+            if queryset is None:
+                return None
+        stamp = queryset.aggregate(
+            count=Count("pk"), updated_at=Max("updated_at")
+        )
+        # Удаление из списка не меняет самую позднюю дату изменения.
+        return (
+            (stamp["count"], stamp["updated_at"]),
+            stamp["updated_at"] if self.action == "retrieve" else None,
+        )
+
+    def filter_lookup(self, queryset):
+        """
+        queryset объекта из URL или None, если значение не подходит полю
+        (например, pk=abc): тогда обработчик сам ответит 404.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        stamp = self.get_version_stamp(request)
+        if stamp is None:
+            return handler(request, *args, **kwargs)
+        data, updated_at = stamp
+        etag = self.make_etag(request, data)
+        last_modified = (
+            int(updated_at.timestamp()) if updated_at else None
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        # Кэшировать можно, но перед использованием нужно уточнить версию.
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ("Accept", "Authorization"))
+        return response
+
+    def make_etag(self, request, data):
+        source = repr((
+            request.version,
+            request.accepted_media_type,
+            sorted(request.query_params.lists()),
+            data,
+        ))
+        digest = hashlib.md5(source.encode()).hexdigest()
+        return f'W/"{digest}"'
+
+
+class RenderedCacheMixin:
+    """
+    Хранит готовые байты ответов list/retrieve в кэше под версией данных,
+    повторные запросы не трогают ни базу, ни сериализатор.
+    """
+    cache_version_name = None
+    cache_timeout = settings.REFERENCE_CACHE_TIMEOUT
+
+    def get_cache_version(self):
+        return get_version(self.cache_version_name)
+
+    def should_cache(self, request):
+        # Browsable API зависит от пользователя, кэшируем только JSON.
+        return request.accepted_renderer.format == "json"
+
+    def get_cache_parts(self, request):
+        # Все параметры запроса и адрес сайта: ссылки пагинации
+        # (next, previous) и картинок строятся из них.
+        return (
+            self.action,
+            sorted(self.kwargs.items()),
+            request.version,
+            request.accepted_media_type,
+            request.build_absolute_uri("/"),
+            sorted(request.query_params.lists()),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.should_cache(request):
+            return handler(request, *args, **kwargs)
+
+        def render():
+            response = handler(request, *args, **kwargs)
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            return (
+                response.status_code,
+                response.content,
+                response["Content-Type"],
+            )
+
+        status, content, content_type = cache_aside(
+            self.cache_version_name,
+            self.get_cache_parts(request),
+            render,
+            timeout=self.cache_timeout,
+            tags=(self.cache_version_name,),
+            store_if=lambda value: value[0] == 200,
+        )
+        return HttpResponse(content, status=status, content_type=content_type)
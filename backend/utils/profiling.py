@@ -0,0 +1,134 @@
+"""
+Профилирование отдельных запросов. Результат - стеки в свернутом
+формате (collapsed stacks): строка "корень;...;функция микросекунды",
+его понимают flamegraph.pl, speedscope и inferno.
+"""
+import cProfile
+import datetime
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+
+FILE_SUFFIX = ".collapsed"
+# <время>-<pid>-<метод>-<путь>-<длительность>ms.collapsed
+FILE_NAME_RE = re.compile(
+    r"^(?P<time>\d{8}T\d{6}\.\d{6})-(?P<pid>\d+)-(?P<method>[A-Z]+)-"
+    r"(?P<path>.*)-(?P<duration>\d+)ms\.collapsed$"
+)
+
+
+def frame_name(code):
+    # Пробелы и ";" - разделители формата.
+    name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+    return name.replace(";", ":").replace(" ", "_")
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Раз в interval секунд снимает стек потока запроса из отдельного
+    потока. Сам запрос не замедляется, кроме борьбы за GIL.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        # Каждый снимок представляет interval секунд работы.
+        weight = self.interval * 1e6
+        return Counter(
+            {
+                stack: round(count * weight)
+                for stack, count in self.stacks.items()
+            }
+        )
+
+
+class CProfileSampler:
+    """
+    Запасной вариант на cProfile: точные времена, но заметные накладные
+    расходы. Стеки в два уровня (вызывающая;функция) с весом в
+    микросекундах собственного времени.
+    """
+
+    def __init__(self, interval=None):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        stacks = Counter()
+        for function, (_, _, own_time, _, callers) in (
+            pstats.Stats(self.profile).stats.items()
+        ):
+            name = pstats.func_std_string(function).replace(" ", "_")
+            if not callers:
+                stacks[name] += round(own_time * 1e6)
+                continue
+            for caller, (_, _, caller_time, _) in callers.items():
+                caller_name = pstats.func_std_string(caller).replace(
+                    " ", "_"
+                )
+                stacks[f"{caller_name};{name}"] += round(caller_time * 1e6)
+        return +stacks
+
+
+SAMPLERS = {"sample": StackSampler, "cprofile": CProfileSampler}
+
+
+def path_slug(path):
+    # Путь запроса в имени файла профиля.
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return slug[:80]
+
+
+def file_name(method, path, duration):
+    now = datetime.datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    return (
+        f"{now}-{os.getpid()}-{method}-{path_slug(path)}-"
+        f"{round(duration * 1000)}ms{FILE_SUFFIX}"
+    )
+
+
+def save(directory, name, stacks):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{stack} {count}\n")
+
+
+def read(path):
+    stacks = Counter()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return stacks
@@ -0,0 +1,87 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# Значения приходят параметрами, но длина списков IN и числа в LIMIT
+# попадают в текст запроса - для формы запроса они не важны.
+PLACEHOLDERS_RE = re.compile(r"%s(, %s)+")
+NUMBERS_RE = re.compile(r"\b\d+\b")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_shape(sql):
+    return NUMBERS_RE.sub("N", PLACEHOLDERS_RE.sub("%s, ...", sql))
+
+
+class QueryCounter:
+    """
+    Считает запросы ко всем базам текущего потока, их суммарное время
+    и сколько раз повторилась каждая форма запроса.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self)
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._stack.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """Формы запросов, повторившиеся threshold раз и больше (N+1)."""
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def problems(self, budget):
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(
+                f"{self.count} запросов при бюджете {budget}"
+            )
+        problems.extend(
+            f"запрос повторился {count} раз: {shape}"
+            for shape, count in self.repeated()
+        )
+        return problems
+
+
+def get_query_budget(view_func, method):
+    """
+    Бюджет представления: query_budgets = {действие: число запросов}
+    у ViewSet или settings.QUERY_BUDGET_DEFAULT.
+    """
+    view_class = getattr(view_func, "cls", None)
+    budgets = getattr(view_class, "query_budgets", {})
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method.lower())
+    return budgets.get(action, settings.QUERY_BUDGET_DEFAULT)
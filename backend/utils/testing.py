@@ -0,0 +1,44 @@
+"""Помощники для тестов и бенчмарков API."""
+import base64
+import io
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.urls import resolve
+from PIL import Image
+
+from .queries import QueryCounter, get_query_budget
+
+
+def png(size=64):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def png_data_url(size=64):
+    """Картинка для Base64ImageField."""
+    return "data:image/png;base64," + base64.b64encode(png(size)).decode()
+
+
+def get_path_budget(method, path):
+    """Бюджет запросов действия по пути."""
+    match = resolve(urlsplit(path).path)
+    return get_query_budget(match.func, method)
+
+
+class QueryBudgetMixin:
+    """
+    Для TestCase: assertQueryBudget проверяет число
+    запросов и N+1, как QueryBudgetMiddleware.
+    Действия on_commit тоже считаются.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with QueryCounter() as counter:
+            with self.captureOnCommitCallbacks(execute=True):
+                yield counter
+        problems = counter.problems(budget)
+        if problems:
+            self.fail("\n".join(problems))
@@ -0,0 +1,94 @@
+"""
+Ограничения для дорогих действий: частота запросов одного клиента
+(скользящее окно в общем кэше) и число одновременно выполняемых действий
+в процессе (семафоры). Действия и их области задает throttle_scopes
+представления, лимиты - THROTTLE_RATES и CONCURRENCY_LIMITS.
+"""
+import math
+import threading
+
+from django.conf import settings
+from rest_framework.throttling import ScopedRateThrottle
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_throttle_scope(view):
+    scopes = getattr(view, "throttle_scopes", None) or {}
+    return scopes.get(getattr(view, "action", None))
+
+
+class SlidingWindowThrottle(ScopedRateThrottle):
+    """
+    Не больше THROTTLE_RATES[scope] запросов ("10/min") за скользящее
+    окно. Окно приближается двумя счетчиками фиксированных окон:
+    предыдущий учитывается с весом оставшейся в окне доли, поэтому на
+    границе окон клиент не получает двойной лимит.
+
+    Счетчики меняются через cache.add, cache.incr и cache.decr.
+    Атомарно и для всех воркеров это работает только в Redis или
+    Memcached; в файловом кэше (по умолчанию) это чтение и запись, и
+    параллельные запросы могут пройти сверх лимита, а в памяти процесса
+    у каждого воркера свой лимит. Об этом предупреждает
+    manage.py check (utils.checks).
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def allow_request(self, request, view):
+        self.scope = get_throttle_scope(view)
+        if not settings.THROTTLE_ENABLED or self.scope is None:
+            return True
+        self.rate = settings.THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+
+        window, offset = divmod(self.timer(), self.duration)
+        current = f"{self.key}:{int(window)}"
+        # Счетчик нужен и в следующем окне как предыдущий.
+        self.cache.add(current, 0, self.duration * 2)
+        try:
+            count = self.cache.incr(current)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            self.cache.add(current, 1, self.duration * 2)
+            count = 1
+        previous = self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+        self.elapsed = offset / self.duration
+        self.used = previous * (1 - self.elapsed) + count
+        allowed = self.used <= self.num_requests
+        if not allowed:
+            # Отклоненный запрос лимит не расходует.
+            self.cache.decr(current)
+            self.used -= 1
+        request.rate_limit = self.get_headers()
+        return allowed
+
+    def wait(self):
+        # Оценка: вес предыдущего окна убывает линейно до конца окна.
+        return (1 - self.elapsed) * self.duration
+
+    def get_headers(self):
+        return {
+            "RateLimit-Limit": self.num_requests,
+            "RateLimit-Remaining": max(
+                0, math.floor(self.num_requests - self.used)
+            ),
+            "RateLimit-Reset": math.ceil((1 - self.elapsed) * self.duration),
+        }
+
+
+def get_semaphore(scope):
+    """Семафор процесса для scope или None, если лимита нет."""
+    limit = settings.CONCURRENCY_LIMITS.get(scope)
+    if not settings.THROTTLE_ENABLED or not limit:
+        return None
+    with _semaphores_lock:
+        semaphore, current = _semaphores.get(scope, (None, None))
+        if current != limit:
+            semaphore = threading.BoundedSemaphore(limit)
+            _semaphores[scope] = (semaphore, limit)
+    return semaphore
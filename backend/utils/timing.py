@@ -0,0 +1,40 @@
+"""
+Метки для ServerTimingMiddleware: settings подставляет
+"utils.timing.<Имя класса middleware>" перед каждым middleware
+и "utils.timing.View" перед представлением. Классы меток создаются
+при импорте по settings.MIDDLEWARE, отдельно описывать их не нужно.
+"""
+import time
+
+from django.conf import settings
+
+
+class TimingMarker:
+    label = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = getattr(request, "timings", None)
+        if timings is None:
+            return self.get_response(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        timings.append((self.label, time.perf_counter() - started))
+        return response
+
+
+def make_marker(name):
+    """Класс метки слоя name, в Server-Timing - имя в нижнем регистре."""
+    return type(
+        name, (TimingMarker,), {"label": name.lower(), "__module__": __name__}
+    )
+
+
+View = make_marker("View")
+globals().update(
+    (name, make_marker(name))
+    for name in {path.rsplit(".", 1)[1] for path in settings.MIDDLEWARE}
+    if name not in globals()
+)
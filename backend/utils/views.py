@@ -0,0 +1,87 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views.static import serve
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.versioning import AcceptHeaderVersioning
+
+from recipes.storage import CONTENT_NAME_RE
+
+from . import metrics
+from .cache import make_key
+from .db import use_primary
+from .renderers import FastJSONRenderer
+
+# Год - максимальный срок, который стоит указывать в max-age.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    response = serve(request, path, document_root, show_indexes)
+    if CONTENT_NAME_RE.search(path):
+        # Имя - хеш содержимого, поэтому файл не меняется никогда.
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    return response
+
+
+def metrics_view(request):
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def negotiate_version(request):
+    """
+    Версия API из Accept, как у AcceptHeaderVersioning в DRF.
+    Недопустимая версия или тип ответа - NotAcceptable.
+    """
+    api_request = Request(request)
+    negotiation = DefaultContentNegotiation()
+    _, api_request.accepted_media_type = negotiation.select_renderer(
+        api_request, (FastJSONRenderer(),)
+    )
+    return AcceptHeaderVersioning().determine_version(api_request)
+
+
+async def cached_json_response(request, name, compute):
+    """
+    JSON-ответ async-представления с ETag и готовыми байтами в кэше,
+    как у ConditionalGetMixin и RenderedCacheMixin. compute - корутина,
+    возвращающая данные; считается только при промахе.
+    """
+    try:
+        version = negotiate_version(request)
+    except NotAcceptable as error:
+        return HttpResponse(
+            FastJSONRenderer().render({"detail": error.detail}),
+            content_type="application/json",
+            status=error.status_code,
+        )
+    # Ключ включает версию данных и поэтому годится как ETag.
+    key = await sync_to_async(make_key)(
+        f"{name}:async",
+        (request.path, version, sorted(request.GET.lists())),
+        (name,),
+    )
+    etag = f'W/"{key.rsplit(":", 1)[-1]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = await cache.aget(key)
+        if content is None:
+            with use_primary():
+                data = await compute()
+            content = FastJSONRenderer().render(data)
+            await cache.aset(key, content, settings.REFERENCE_CACHE_TIMEOUT)
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ("Accept", "Authorization"))
+    return response